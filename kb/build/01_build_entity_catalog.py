@@ -1,25 +1,41 @@
 from __future__ import annotations
 
 import argparse
-import json
-import xml.etree.ElementTree as ET
 from collections import defaultdict
 from pathlib import Path
+from typing import Iterable
+
+try:
+    from lxml import etree as xml_etree
+
+    _ITERPARSE_KWARGS = {"huge_tree": True}
+except ImportError:
+    import xml.etree.ElementTree as xml_etree
+
+    _ITERPARSE_KWARGS = {}
 
 try:
     from .common import (
+        dumps_json_line,
         ensure_files,
         iter_rrf,
+        iter_rrf_bytes,
         normalize_surface,
+        prefetch_files,
         slugify,
+        write_entity_catalog_parquet,
         write_json,
     )
 except ImportError:
     from kb.build.common import (
+        dumps_json_line,
         ensure_files,
         iter_rrf,
+        iter_rrf_bytes,
         normalize_surface,
+        prefetch_files,
         slugify,
+        write_entity_catalog_parquet,
         write_json,
     )
 
@@ -30,16 +46,27 @@ CHEMICAL_TUIS = {"T103", "T104", "T109", "T110", "T111", "T114", "T115", "T116",
 GENE_TUIS = {"T028", "T085", "T086", "T087", "T088"}
 
 
+_TYPE_PRIORITY = (
+    ("drug", DRUG_TUIS),
+    ("disease", DISEASE_TUIS),
+    ("chemical", CHEMICAL_TUIS),
+    ("gene", GENE_TUIS),
+)
+# TUI -> (priority, type); a TUI listed under several types keeps its highest-priority one.
+_TUI_TYPE: dict[str, tuple[int, str]] = {
+    tui: (rank, etype)
+    for rank, (etype, tuis) in reversed(list(enumerate(_TYPE_PRIORITY)))
+    for tui in tuis
+}
+
+
 def infer_entity_type(tuis: set[str]) -> str:
-    if tuis & DRUG_TUIS:
-        return "drug"
-    if tuis & DISEASE_TUIS:
-        return "disease"
-    if tuis & CHEMICAL_TUIS:
-        return "chemical"
-    if tuis & GENE_TUIS:
-        return "gene"
-    return "entity"
+    best = None
+    for tui in tuis:
+        hit = _TUI_TYPE.get(tui)
+        if hit is not None and (best is None or hit < best):
+            best = hit
+    return best[1] if best is not None else "entity"
 
 
 def kg_id_for(cui: str, canonical: str, entity_type: str) -> str:
@@ -48,22 +75,39 @@ def kg_id_for(cui: str, canonical: str, entity_type: str) -> str:
     return f"umls_{cui.lower()}"
 
 
-def _add_synonym(catalog: dict, by_norm: dict, kg_id: str, value: str, source: str) -> bool:
-    s = (value or "").strip()
-    if len(s) < 2:
-        return False
-    n = normalize_surface(s)
-    if n not in by_norm:
-        return False
-    hits = by_norm[n]
-    if len(hits) != 1:
-        return False
-    tgt = next(iter(hits))
-    if tgt != kg_id:
-        return False
-    catalog[kg_id]["synonyms"].add(s)
-    catalog[kg_id]["sources"].add(source)
-    return True
+def _iter_root_children(path: Path, tag: str):
+    """Streams direct children of the XML root named ``tag``, releasing each after use."""
+    root = None
+    depth = 0
+    for event, elem in xml_etree.iterparse(str(path), events=("start", "end"), **_ITERPARSE_KWARGS):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            if elem.tag == tag:
+                yield elem
+            root.clear()
+
+
+def _add_synonyms(unique_surface: dict, names: Iterable[str], entity_type: str, source: str) -> int:
+    """Attaches each name whose surface maps to exactly one ``entity_type`` row; returns count."""
+    lookup = unique_surface.get
+    norm = normalize_surface
+    added = 0
+    for name in names:
+        s = (name or "").strip()
+        if len(s) < 2:
+            continue
+        row = lookup(norm(s))
+        if row is None or row["entity_type"] != entity_type:
+            continue
+        row["synonyms"].add(s)
+        row["sources"].add(source)
+        added += 1
+    return added
 
 
 def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500000) -> dict:
@@ -79,7 +123,7 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
 
     cui_tuis: dict[str, set[str]] = defaultdict(set)
     mrsty_rows = 0
-    for fields in iter_rrf(um_sty, progress_every=progress_every):
+    for fields in iter_rrf(um_sty, progress_every=progress_every, maxsplit=4):
         mrsty_rows += 1
         if len(fields) < 4:
             continue
@@ -88,6 +132,9 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
         if cui and tui:
             cui_tuis[cui].add(tui)
 
+    cui_type = {cui: infer_entity_type(tuis) for cui, tuis in cui_tuis.items()}
+    del cui_tuis
+
     catalog: dict[str, dict] = {}
     cui_to_kg: dict[str, str] = {}
     by_norm_surface: dict[str, set[str]] = defaultdict(set)
@@ -95,26 +142,37 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
     mrconso_rows = 0
     filtered_non_eng = 0
 
-    for fields in iter_rrf(um_conso, progress_every=progress_every):
+    # Warm the page cache for the later inputs while MRCONSO is being parsed.
+    prefetch_files([rxn_conso, drugbank_xml, mesh_xml])
+    for fields in iter_rrf_bytes(um_conso, progress_every=progress_every, maxsplit=15):
         mrconso_rows += 1
         if len(fields) < 15:
             continue
-        cui = fields[0].strip().upper()
-        lat = fields[1].strip().upper()
-        is_pref = fields[6].strip().upper() == "Y"
-        text = fields[14].strip()
-        if not (cui and text):
+        # Filter on LAT before decoding; non-English rows only get a bytes-level
+        # blank check for the counter (a field holding nothing but non-ASCII
+        # whitespace or undecodable bytes would be counted here but not before).
+        if fields[1].strip().upper() != b"ENG":
+            if fields[0].strip() and fields[14].strip():
+                filtered_non_eng += 1
             continue
-        if lat != "ENG":
-            filtered_non_eng += 1
+        cui = fields[0].decode("utf-8", errors="ignore").strip()
+        text = fields[14].decode("utf-8", errors="ignore").strip()
+        if not (cui and text):
             continue
+        cui = cui.upper()
+        is_pref = fields[6].strip().upper() == b"Y"
 
-        etype = infer_entity_type(cui_tuis.get(cui, set()))
+        etype = cui_type.get(cui, "entity")
         if etype == "entity":
             continue
         if cui not in cui_seen:
             canonical = text
             kg_id = kg_id_for(cui, canonical, etype)
+            replaced = catalog.get(kg_id)
+            if replaced is not None:
+                # Slug collision: the earlier entry is overwritten, so retract its surfaces.
+                for s in replaced["synonyms"]:
+                    by_norm_surface[normalize_surface(s)].discard(kg_id)
             catalog[kg_id] = {
                 "kg_id": kg_id,
                 "cui": cui,
@@ -130,32 +188,33 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
             if is_pref:
                 catalog[kg_id]["canonical_name"] = text
             catalog[kg_id]["synonyms"].add(text)
+        by_norm_surface[normalize_surface(text)].add(kg_id)
 
-    for kg_id, row in catalog.items():
-        for s in row["synonyms"]:
-            by_norm_surface[normalize_surface(s)].add(kg_id)
+    # Only unambiguous surfaces can attach external synonyms, so keep just those,
+    # pointing straight at their catalog rows.
+    unique_surface: dict[str, dict] = {
+        n: catalog[next(iter(hits))] for n, hits in by_norm_surface.items() if len(hits) == 1
+    }
+    del by_norm_surface
 
+    # Collect candidate names per source, then resolve each batch in one pass.
     rx_rows = 0
-    rx_added = 0
-    for fields in iter_rrf(rxn_conso, progress_every=progress_every):
+    rx_names: list[str] = []
+    for fields in iter_rrf_bytes(rxn_conso, progress_every=progress_every, maxsplit=15):
         rx_rows += 1
         if len(fields) < 15:
             continue
         sab = fields[11].strip().upper()
         tty = fields[12].strip().upper()
-        text = fields[14].strip()
-        if sab != "RXNORM" or tty not in {"IN", "BN", "PIN"}:
+        if sab != b"RXNORM" or tty not in {b"IN", b"BN", b"PIN"}:
             continue
-        n = normalize_surface(text)
-        for kg_id in by_norm_surface.get(n, set()):
-            if catalog[kg_id]["entity_type"] == "drug":
-                if _add_synonym(catalog, by_norm_surface, kg_id, text, "RxNorm"):
-                    rx_added += 1
+        rx_names.append(fields[14].decode("utf-8", errors="ignore"))
+    rx_added = _add_synonyms(unique_surface, rx_names, "drug", "RxNorm")
+    del rx_names
 
-    db_added = 0
+    db_names: list[str] = []
     ns = {"db": "http://www.drugbank.ca"}
-    root = ET.parse(drugbank_xml).getroot()
-    for drug in root.findall("db:drug", ns):
+    for drug in _iter_root_children(drugbank_xml, "{http://www.drugbank.ca}drug"):
         names = set()
         main_name = drug.findtext("db:name", default="", namespaces=ns)
         if main_name:
@@ -166,16 +225,12 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
         for syn in drug.findall("db:synonyms/db:synonym", ns):
             if syn.text:
                 names.add(syn.text)
-        for name in names:
-            n = normalize_surface(name)
-            for kg_id in by_norm_surface.get(n, set()):
-                if catalog[kg_id]["entity_type"] == "drug":
-                    if _add_synonym(catalog, by_norm_surface, kg_id, name, "DrugBank"):
-                        db_added += 1
-
-    mesh_added = 0
-    root = ET.parse(mesh_xml).getroot()
-    for desc in root.findall("DescriptorRecord"):
+        db_names.extend(names)
+    db_added = _add_synonyms(unique_surface, db_names, "drug", "DrugBank")
+    del db_names
+
+    mesh_terms: list[str] = []
+    for desc in _iter_root_children(mesh_xml, "DescriptorRecord"):
         terms = set()
         dn = desc.findtext("DescriptorName/String", default="")
         if dn:
@@ -183,28 +238,22 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
         for term in desc.findall("ConceptList/Concept/TermList/Term/String"):
             if term.text:
                 terms.add(term.text)
-        for t in terms:
-            n = normalize_surface(t)
-            for kg_id in by_norm_surface.get(n, set()):
-                if catalog[kg_id]["entity_type"] == "disease":
-                    if _add_synonym(catalog, by_norm_surface, kg_id, t, "MeSH"):
-                        mesh_added += 1
+        mesh_terms.extend(terms)
+    mesh_added = _add_synonyms(unique_surface, mesh_terms, "disease", "MeSH")
+    del mesh_terms
 
     written = 0
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with out_path.open("w", encoding="utf-8", newline="\n") as f:
-        for kg_id in sorted(catalog):
+    ordered = sorted(catalog)
+    with out_path.open("wb") as f:
+        for kg_id in ordered:
             row = catalog[kg_id]
-            payload = {
-                "kg_id": row["kg_id"],
-                "cui": row["cui"],
-                "entity_type": row["entity_type"],
-                "canonical_name": row["canonical_name"],
-                "synonyms": sorted(set(row["synonyms"])),
-                "sources": sorted(set(row["sources"])),
-            }
-            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            # synonyms/sources are already sets; sort them in place of the set objects.
+            row["synonyms"] = sorted(row["synonyms"])
+            row["sources"] = sorted(row["sources"])
+            f.write(dumps_json_line(row))
             written += 1
+    parquet_path = write_entity_catalog_parquet(out_path, [catalog[kg_id] for kg_id in ordered])
 
     report = {
         "stage": "01_build_entity_catalog",
@@ -228,6 +277,8 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
         },
         "outputs": {"entity_catalog": str(out_path)},
     }
+    if parquet_path is not None:
+        report["outputs"]["entity_catalog_parquet"] = str(parquet_path)
     write_json(report_path, report)
     return report
 
@@ -5,17 +5,21 @@ from pathlib import Path
 
 try:
     from .common import (
+        edge_key,
         ensure_files,
         iter_rrf,
         load_type_map_from_catalog,
+        map_line_shards,
         write_edges_csv,
         write_json,
     )
 except ImportError:
     from kb.build.common import (
+        edge_key,
         ensure_files,
         iter_rrf,
         load_type_map_from_catalog,
+        map_line_shards,
         write_edges_csv,
         write_json,
     )
@@ -29,42 +33,49 @@ def _is_disease_like(t: str) -> bool:
     return t in {"disease"}
 
 
+_RELA_MAP = {
+    "may_treat": "TREATS",
+    "treats": "TREATS",
+    "treated_by": "TREATS",
+    "treatment_of": "TREATS",
+    "causes": "ADVERSE_EFFECT",
+    "induces": "ADVERSE_EFFECT",
+    "adverse_effect_of": "ADVERSE_EFFECT",
+    "contraindicated_with_disease": "CONTRAINDICATED_FOR",
+    "contraindicated_with": "CONTRAINDICATED_FOR",
+    "interacts_with": "INTERACTS_WITH",
+    "ddi": "INTERACTS_WITH",
+    "drug_interaction": "INTERACTS_WITH",
+}
+_ASSOCIATED_RELS = frozenset({"RO", "RQ"})
+
+
 def map_relation(rel: str, rela: str) -> str | None:
-    r = (rela or rel or "").strip().lower()
-    if r in {"may_treat", "treats", "treated_by", "treatment_of"}:
-        return "TREATS"
-    if r in {"causes", "induces", "adverse_effect_of"}:
-        return "ADVERSE_EFFECT"
-    if r in {"contraindicated_with_disease", "contraindicated_with"}:
-        return "CONTRAINDICATED_FOR"
-    if r in {"interacts_with", "ddi", "drug_interaction"}:
-        return "INTERACTS_WITH"
-    if (rel or "").strip().upper() in {"RO", "RQ"}:
+    mapped = _RELA_MAP.get((rela or rel or "").strip().lower())
+    if mapped:
+        return mapped
+    if (rel or "").strip().upper() in _ASSOCIATED_RELS:
         return "ASSOCIATED_WITH"
     return None
 
 
-def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500000) -> dict:
-    mrrel = raw_root / "UMLS" / "MRREL.RRF"
-    entity_catalog = out_dir / "entity_catalog.jsonl"
-    ensure_files([mrrel, entity_catalog])
-
-    out_path = out_dir / "kg_edges.umls.csv"
-    report_path = out_dir / "stage_02_report.json"
-
-    cui_to_kg, kg_to_type = load_type_map_from_catalog(entity_catalog)
+def _scan_mrrel(ctx: dict, byte_range: tuple[int, int] | None) -> tuple[list[tuple], dict]:
+    cui_to_kg = ctx["cui_to_kg"]
+    kg_to_type = ctx["kg_to_type"]
+    kg_ix = ctx["kg_ix"]
     counts = {
         "mrrel_rows": 0,
         "mapped_relation": 0,
         "filtered_relation": 0,
         "unmapped_cui": 0,
         "filtered_semantic_type": 0,
-        "written": 0,
     }
 
     seen = set()
     rows = []
-    for fields in iter_rrf(mrrel, progress_every=progress_every):
+    for fields in iter_rrf(
+        ctx["mrrel"], progress_every=ctx["progress_every"], maxsplit=11, byte_range=byte_range
+    ):
         counts["mrrel_rows"] += 1
         if len(fields) < 11:
             continue
@@ -97,20 +108,58 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
                 counts["filtered_semantic_type"] += 1
                 continue
 
-        key = (h, mapped, t)
+        key = edge_key(kg_ix, h, mapped, t)
         if key in seen:
             continue
         seen.add(key)
-        rows.append(
-            {
-                "h": h,
-                "r": mapped,
-                "t": t,
-                "source": "UMLS",
-                "score": 1.0,
-                "evidence": f"{sab}:{rela or rel}",
-            }
-        )
+        rows.append((h, mapped, t, "UMLS", 1.0, f"{sab}:{rela or rel}"))
+    return rows, counts
+
+
+def build(
+    raw_root: Path,
+    out_dir: Path,
+    version: str,
+    progress_every: int = 500000,
+    workers: int = 1,
+) -> dict:
+    mrrel = raw_root / "UMLS" / "MRREL.RRF"
+    entity_catalog = out_dir / "entity_catalog.jsonl"
+    ensure_files([mrrel, entity_catalog])
+
+    out_path = out_dir / "kg_edges.umls.csv"
+    report_path = out_dir / "stage_02_report.json"
+
+    cui_to_kg, kg_to_type = load_type_map_from_catalog(entity_catalog)
+    kg_ix = {kg_id: i for i, kg_id in enumerate(kg_to_type)}
+    counts = {
+        "mrrel_rows": 0,
+        "mapped_relation": 0,
+        "filtered_relation": 0,
+        "unmapped_cui": 0,
+        "filtered_semantic_type": 0,
+        "written": 0,
+    }
+
+    ctx = {
+        "mrrel": mrrel,
+        "progress_every": progress_every,
+        "cui_to_kg": cui_to_kg,
+        "kg_to_type": kg_to_type,
+        "kg_ix": kg_ix,
+    }
+    # Shards dedup locally; re-dedup here in file order so output matches a serial scan.
+    seen = set()
+    rows = []
+    for shard_rows, shard_counts in map_line_shards(mrrel, workers, _scan_mrrel, ctx):
+        for k, v in shard_counts.items():
+            counts[k] += v
+        for row in shard_rows:
+            key = edge_key(kg_ix, row[0], row[1], row[2])
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append(row)
 
     counts["written"] = write_edges_csv(out_path, rows)
     report = {
@@ -130,12 +179,15 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--out_dir", required=True)
     ap.add_argument("--version", required=True)
     ap.add_argument("--progress_every", type=int, default=500000)
+    ap.add_argument("--workers", type=int, default=1)
     return ap.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    report = build(Path(args.raw_root), Path(args.out_dir), args.version, args.progress_every)
+    report = build(
+        Path(args.raw_root), Path(args.out_dir), args.version, args.progress_every, args.workers
+    )
     print(
         f"[02] wrote {report['outputs']['kg_edges_umls']} "
         f"({report['counts']['written']} edges)"
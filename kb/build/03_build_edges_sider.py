@@ -6,8 +6,10 @@ from pathlib import Path
 
 try:
     from .common import (
+        edge_key,
         ensure_files,
         iter_tsv,
+        map_line_shards,
         normalize_surface,
         read_entity_catalog,
         write_edges_csv,
@@ -15,8 +17,10 @@ try:
     )
 except ImportError:
     from kb.build.common import (
+        edge_key,
         ensure_files,
         iter_tsv,
+        map_line_shards,
         normalize_surface,
         read_entity_catalog,
         write_edges_csv,
@@ -24,11 +28,67 @@ except ImportError:
     )
 
 
+_NO_HITS: frozenset[str] = frozenset()
+
+
 def _resolve_file(preferred: Path, fallback: Path) -> Path:
     return preferred if preferred.exists() else fallback
 
 
-def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500000) -> dict:
+def _scan_meddra(ctx: dict, byte_range: tuple[int, int] | None) -> tuple[list[tuple], dict]:
+    stitch_to_names = ctx["stitch_to_names"]
+    drug_idx = ctx["drug_idx"]
+    disease_idx = ctx["disease_idx"]
+    kg_ix = ctx["kg_ix"]
+    counts = {"meddra_rows": 0, "unmapped_drug": 0, "unmapped_effect": 0}
+    # Names repeat across thousands of rows; memoize raw name -> sorted index hits.
+    drug_hits: dict[str, tuple[str, ...]] = {}
+    effect_hits: dict[str, tuple[str, ...]] = {}
+
+    seen = set()
+    out_rows = []
+    for fields in iter_tsv(ctx["meddra"], progress_every=ctx["progress_every"], byte_range=byte_range):
+        counts["meddra_rows"] += 1
+        if len(fields) < 6:
+            continue
+        stitch = fields[0].strip() or fields[1].strip()
+        effect = fields[-1].strip()
+        drug_name = stitch_to_names.get(stitch, "")
+        if not (drug_name and effect):
+            continue
+        d_hits = drug_hits.get(drug_name)
+        if d_hits is None:
+            d_hits = drug_hits[drug_name] = tuple(
+                sorted(drug_idx.get(normalize_surface(drug_name), _NO_HITS))
+            )
+        e_hits = effect_hits.get(effect)
+        if e_hits is None:
+            e_hits = effect_hits[effect] = tuple(
+                sorted(disease_idx.get(normalize_surface(effect), _NO_HITS))
+            )
+        if not d_hits:
+            counts["unmapped_drug"] += 1
+            continue
+        if not e_hits:
+            counts["unmapped_effect"] += 1
+            continue
+        for d in d_hits:
+            for e in e_hits:
+                key = edge_key(kg_ix, d, "ADVERSE_EFFECT", e)
+                if key in seen:
+                    continue
+                seen.add(key)
+                out_rows.append((d, "ADVERSE_EFFECT", e, "SIDER", 0.9, f"{drug_name} -> {effect}"))
+    return out_rows, counts
+
+
+def build(
+    raw_root: Path,
+    out_dir: Path,
+    version: str,
+    progress_every: int = 500000,
+    workers: int = 1,
+) -> dict:
     drug_names = raw_root / "SIDER" / "drug_names.tsv"
     meddra = _resolve_file(
         raw_root / "SIDER" / "meddra_all_se.tsv",
@@ -41,6 +101,7 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
     report_path = out_dir / "stage_03_report.json"
 
     rows = read_entity_catalog(entity_catalog)
+    kg_ix = {row["kg_id"]: i for i, row in enumerate(rows)}
     drug_idx: dict[str, set[str]] = defaultdict(set)
     disease_idx: dict[str, set[str]] = defaultdict(set)
     for row in rows:
@@ -68,41 +129,26 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 500
         "written": 0,
     }
 
+    ctx = {
+        "meddra": meddra,
+        "progress_every": progress_every,
+        "stitch_to_names": stitch_to_names,
+        "drug_idx": drug_idx,
+        "disease_idx": disease_idx,
+        "kg_ix": kg_ix,
+    }
+    # Shards dedup locally; re-dedup here in file order so output matches a serial scan.
     seen = set()
     out_rows = []
-    for fields in iter_tsv(meddra, progress_every=progress_every):
-        counts["meddra_rows"] += 1
-        if len(fields) < 6:
-            continue
-        stitch = fields[0].strip() or fields[1].strip()
-        effect = fields[-1].strip()
-        drug_name = stitch_to_names.get(stitch, "")
-        if not (drug_name and effect):
-            continue
-        d_hits = drug_idx.get(normalize_surface(drug_name), set())
-        e_hits = disease_idx.get(normalize_surface(effect), set())
-        if not d_hits:
-            counts["unmapped_drug"] += 1
-            continue
-        if not e_hits:
-            counts["unmapped_effect"] += 1
-            continue
-        for d in sorted(d_hits):
-            for e in sorted(e_hits):
-                key = (d, "ADVERSE_EFFECT", e)
-                if key in seen:
-                    continue
-                seen.add(key)
-                out_rows.append(
-                    {
-                        "h": d,
-                        "r": "ADVERSE_EFFECT",
-                        "t": e,
-                        "source": "SIDER",
-                        "score": 0.9,
-                        "evidence": f"{drug_name} -> {effect}",
-                    }
-                )
+    for shard_rows, shard_counts in map_line_shards(meddra, workers, _scan_meddra, ctx):
+        for k, v in shard_counts.items():
+            counts[k] += v
+        for row in shard_rows:
+            key = edge_key(kg_ix, row[0], row[1], row[2])
+            if key in seen:
+                continue
+            seen.add(key)
+            out_rows.append(row)
 
     counts["written"] = write_edges_csv(out_path, out_rows)
     report = {
@@ -126,12 +172,15 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--out_dir", required=True)
     ap.add_argument("--version", required=True)
     ap.add_argument("--progress_every", type=int, default=500000)
+    ap.add_argument("--workers", type=int, default=1)
     return ap.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    report = build(Path(args.raw_root), Path(args.out_dir), args.version, args.progress_every)
+    report = build(
+        Path(args.raw_root), Path(args.out_dir), args.version, args.progress_every, args.workers
+    )
     print(
         f"[03] wrote {report['outputs']['kg_edges_sider']} "
         f"({report['counts']['written']} edges)"
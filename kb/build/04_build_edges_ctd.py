@@ -4,27 +4,44 @@ import argparse
 import csv
 from collections import defaultdict
 from pathlib import Path
+from typing import Iterator
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+    pacsv = None
 
 try:
     from .common import (
+        edge_key,
         ensure_files,
-        normalize_surface,
+        iter_lines,
+        map_line_shards,
         open_text_auto,
+        normalize_surface,
         read_entity_catalog,
         write_edges_csv,
         write_json,
     )
 except ImportError:
     from kb.build.common import (
+        edge_key,
         ensure_files,
-        normalize_surface,
+        iter_lines,
+        map_line_shards,
         open_text_auto,
+        normalize_surface,
         read_entity_catalog,
         write_edges_csv,
         write_json,
     )
 
 
+_NO_HITS: frozenset[str] = frozenset()
+
+
 def _resolve_ctd(path_gz: Path) -> Path:
     if path_gz.exists():
         return path_gz
@@ -32,7 +49,130 @@ def _resolve_ctd(path_gz: Path) -> Path:
     return alt
 
 
-def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 300000) -> dict:
+# Positions of ChemicalName, DiseaseName, DirectEvidence, InferenceScore.
+_CTD_INDEXES = (0, 3, 4, 7)
+
+
+def _iter_ctd_csv(path: Path, progress_every: int, byte_range: tuple[int, int] | None) -> Iterator[tuple]:
+    for row in csv.reader(iter_lines(path, progress_every, byte_range)):
+        if not row:
+            continue
+        if row[0].startswith("#"):
+            continue
+        if len(row) < 6:
+            continue
+        if row[0] == "ChemicalName":
+            continue
+        yield row[0], row[3], row[4], row[7] if len(row) > 7 else ""
+
+
+def _iter_ctd_arrow(path: Path, progress_every: int) -> Iterator[tuple]:
+    """Streams CTD through pyarrow's C++ CSV reader (handles .gz natively).
+
+    Yields the same records as ``_iter_ctd_csv``. Rows with fewer than six
+    fields are skipped as there; a ragged row the csv path would keep raises
+    ``pa.ArrowInvalid`` so the caller can rescan with the csv reader.
+    """
+    skip = 0
+    with open_text_auto(path) as f:
+        for line in f:
+            if not line.startswith("#"):
+                break
+            skip += 1
+    names = [f"f{i}" for i in _CTD_INDEXES]
+    reader = pacsv.open_csv(
+        str(path),
+        read_options=pacsv.ReadOptions(
+            skip_rows=skip, autogenerate_column_names=True, block_size=8 << 20
+        ),
+        parse_options=pacsv.ParseOptions(
+            invalid_row_handler=lambda row: "skip" if row.actual_columns < 6 else "error"
+        ),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=names,
+            include_missing_columns=True,
+            column_types={n: pa.string() for n in names},
+            strings_can_be_null=False,
+        ),
+    )
+    seen_rows = 0
+    next_report = progress_every
+    for batch in reader:
+        cols = [batch.column(n).to_pylist() for n in names]
+        for chem, disease, evidence, score in zip(*cols):
+            if chem.startswith("#") or chem == "ChemicalName":
+                continue
+            yield chem, disease or "", evidence or "", score or ""
+        seen_rows += batch.num_rows
+        if progress_every and seen_rows >= next_report:
+            print(f"[{path.name}] read {seen_rows:,} lines")
+            next_report = (seen_rows // progress_every + 1) * progress_every
+
+
+def _scan_ctd(ctx: dict, byte_range: tuple[int, int] | None) -> tuple[list[tuple], dict]:
+    if pacsv is not None and byte_range is None:
+        try:
+            return _collect_ctd(ctx, _iter_ctd_arrow(ctx["ctd"], ctx["progress_every"]))
+        except pa.ArrowInvalid as exc:
+            print(f"[{ctx['ctd'].name}] ragged rows, rescanning with csv: {exc}")
+    return _collect_ctd(ctx, _iter_ctd_csv(ctx["ctd"], ctx["progress_every"], byte_range))
+
+
+def _collect_ctd(ctx: dict, records: Iterator[tuple]) -> tuple[list[tuple], dict]:
+    chem_idx = ctx["chem_idx"]
+    disease_idx = ctx["disease_idx"]
+    kg_ix = ctx["kg_ix"]
+    counts = {"ctd_rows": 0, "unmapped_chemical": 0, "unmapped_disease": 0}
+    # Chemical and disease names repeat across millions of rows; memoize raw name -> sorted hits.
+    chemical_hits: dict[str, tuple[str, ...]] = {}
+    disease_hits: dict[str, tuple[str, ...]] = {}
+
+    seen = set()
+    out_rows = []
+    for chemical_name, disease_name, direct_evidence, inf_score in records:
+        counts["ctd_rows"] += 1
+        chemical_name = chemical_name.strip()
+        disease_name = disease_name.strip()
+        direct_evidence = direct_evidence.strip().lower()
+        inf_score = inf_score.strip()
+
+        chem_hits = chemical_hits.get(chemical_name)
+        if chem_hits is None:
+            chem_hits = chemical_hits[chemical_name] = tuple(
+                sorted(chem_idx.get(normalize_surface(chemical_name), _NO_HITS))
+            )
+        dis_hits = disease_hits.get(disease_name)
+        if dis_hits is None:
+            dis_hits = disease_hits[disease_name] = tuple(
+                sorted(disease_idx.get(normalize_surface(disease_name), _NO_HITS))
+            )
+        if not chem_hits:
+            counts["unmapped_chemical"] += 1
+            continue
+        if not dis_hits:
+            counts["unmapped_disease"] += 1
+            continue
+
+        rel = "TREATS" if "therapeutic" in direct_evidence else "ASSOCIATED_WITH"
+        score = float(inf_score) if inf_score.replace(".", "", 1).isdigit() else 0.75
+        for h in chem_hits:
+            for t in dis_hits:
+                key = edge_key(kg_ix, h, rel, t)
+                if key in seen:
+                    continue
+                seen.add(key)
+                evidence = f"{chemical_name} -> {disease_name} ({direct_evidence})"
+                out_rows.append((h, rel, t, "CTD", score, evidence))
+    return out_rows, counts
+
+
+def build(
+    raw_root: Path,
+    out_dir: Path,
+    version: str,
+    progress_every: int = 300000,
+    workers: int = 1,
+) -> dict:
     ctd = _resolve_ctd(raw_root / "CTD" / "CTD_chemicals_diseases.csv.gz")
     entity_catalog = out_dir / "entity_catalog.jsonl"
     ensure_files([ctd, entity_catalog])
@@ -41,6 +181,7 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 300
     report_path = out_dir / "stage_04_report.json"
 
     rows = read_entity_catalog(entity_catalog)
+    kg_ix = {row["kg_id"]: i for i, row in enumerate(rows)}
     chem_idx: dict[str, set[str]] = defaultdict(set)
     disease_idx: dict[str, set[str]] = defaultdict(set)
     for row in rows:
@@ -59,55 +200,27 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 300
         "written": 0,
     }
 
+    ctx = {
+        "ctd": ctd,
+        "progress_every": progress_every,
+        "chem_idx": chem_idx,
+        "disease_idx": disease_idx,
+        "kg_ix": kg_ix,
+    }
+    # Shards dedup locally; re-dedup here in file order so output matches a serial scan.
     seen = set()
     out_rows = []
-    with open_text_auto(ctd) as f:
-        reader = csv.reader(f)
-        for i, row in enumerate(reader, start=1):
-            if progress_every and i % progress_every == 0:
-                print(f"[{ctd.name}] read {i:,} lines")
-            if not row:
-                continue
-            if row[0].startswith("#"):
-                continue
-            if len(row) < 6:
-                continue
-            if row[0] == "ChemicalName":
+    for shard_rows, shard_counts in map_line_shards(
+        ctd, workers, _scan_ctd, ctx, quoted_csv=True
+    ):
+        for k, v in shard_counts.items():
+            counts[k] += v
+        for row in shard_rows:
+            key = edge_key(kg_ix, row[0], row[1], row[2])
+            if key in seen:
                 continue
-
-            counts["ctd_rows"] += 1
-            chemical_name = row[0].strip()
-            disease_name = row[3].strip()
-            direct_evidence = row[4].strip().lower()
-            inf_score = row[7].strip() if len(row) > 7 else ""
-
-            chem_hits = chem_idx.get(normalize_surface(chemical_name), set())
-            dis_hits = disease_idx.get(normalize_surface(disease_name), set())
-            if not chem_hits:
-                counts["unmapped_chemical"] += 1
-                continue
-            if not dis_hits:
-                counts["unmapped_disease"] += 1
-                continue
-
-            rel = "TREATS" if "therapeutic" in direct_evidence else "ASSOCIATED_WITH"
-            score = float(inf_score) if inf_score.replace(".", "", 1).isdigit() else 0.75
-            for h in sorted(chem_hits):
-                for t in sorted(dis_hits):
-                    key = (h, rel, t)
-                    if key in seen:
-                        continue
-                    seen.add(key)
-                    out_rows.append(
-                        {
-                            "h": h,
-                            "r": rel,
-                            "t": t,
-                            "source": "CTD",
-                            "score": score,
-                            "evidence": f"{chemical_name} -> {disease_name} ({direct_evidence})",
-                        }
-                    )
+            seen.add(key)
+            out_rows.append(row)
 
     counts["written"] = write_edges_csv(out_path, out_rows)
     report = {
@@ -127,12 +240,15 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--out_dir", required=True)
     ap.add_argument("--version", required=True)
     ap.add_argument("--progress_every", type=int, default=300000)
+    ap.add_argument("--workers", type=int, default=1)
     return ap.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    report = build(Path(args.raw_root), Path(args.out_dir), args.version, args.progress_every)
+    report = build(
+        Path(args.raw_root), Path(args.out_dir), args.version, args.progress_every, args.workers
+    )
     print(
         f"[04] wrote {report['outputs']['kg_edges_ctd']} "
         f"({report['counts']['written']} edges)"
@@ -2,37 +2,44 @@ from __future__ import annotations
 
 import argparse
 import csv
+import shutil
 from pathlib import Path
 
 try:
-    from .common import ensure_files, write_json
+    from .common import ensure_files, write_csv_rows, write_json
 except ImportError:
-    from kb.build.common import ensure_files, write_json
+    from kb.build.common import ensure_files, write_csv_rows, write_json
+
+
+def _cell(row: list[str], idx: int | None) -> str:
+    if idx is None or idx >= len(row):
+        return ""
+    return row[idx].strip()
 
 
 def _read_edges(path: Path):
     with path.open("r", encoding="utf-8", newline="") as f:
-        r = csv.DictReader(f)
-        alias = {h.lower(): h for h in (r.fieldnames or [])}
-        hcol = alias.get("h") or alias.get("head")
-        rcol = alias.get("r") or alias.get("relation")
-        tcol = alias.get("t") or alias.get("tail")
+        r = csv.reader(f)
+        alias = {h.lower(): i for i, h in enumerate(next(r, None) or [])}
+        hcol = alias.get("h", alias.get("head"))
+        rcol = alias.get("r", alias.get("relation"))
+        tcol = alias.get("t", alias.get("tail"))
         scol = alias.get("source")
         pcol = alias.get("score")
         ecol = alias.get("evidence")
         for row in r:
-            h = (row.get(hcol) or "").strip()
-            rel = (row.get(rcol) or "").strip()
-            t = (row.get(tcol) or "").strip()
+            h = _cell(row, hcol)
+            rel = _cell(row, rcol)
+            t = _cell(row, tcol)
             if not (h and rel and t):
                 continue
-            src = (row.get(scol) or "").strip() if scol else ""
-            score_raw = (row.get(pcol) or "").strip() if pcol else ""
+            src = _cell(row, scol)
+            score_raw = _cell(row, pcol)
             try:
                 score = float(score_raw)
             except Exception:
                 score = 1.0
-            ev = (row.get(ecol) or "").strip() if ecol else ""
+            ev = _cell(row, ecol)
             yield h, rel, t, src, score, ev
 
 
@@ -47,66 +54,42 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 0)
     out_plus = out_dir / "kg_edges.merged.plus.csv"
     report_path = out_dir / "stage_05_report.json"
 
-    merged: dict[tuple[str, str, str], dict] = {}
+    # key -> [max score, sources, evidence]
+    merged: dict[tuple[str, str, str], list] = {}
     seen_rows = 0
     for p in (p1, p2, p3):
         for h, rel, t, src, score, ev in _read_edges(p):
             seen_rows += 1
             key = (h, rel, t)
-            if key not in merged:
-                merged[key] = {
-                    "h": h,
-                    "r": rel,
-                    "t": t,
-                    "source": set([src]) if src else set(),
-                    "score": score,
-                    "evidence": set([ev]) if ev else set(),
-                }
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [score, {src}, {ev}]
             else:
-                merged[key]["source"].add(src)
-                merged[key]["evidence"].add(ev)
-                if score > merged[key]["score"]:
-                    merged[key]["score"] = score
-
-    rows = []
-    for key in sorted(merged):
-        row = merged[key]
-        rows.append(
-            {
-                "h": row["h"],
-                "r": row["r"],
-                "t": row["t"],
-                "source": "|".join(sorted(x for x in row["source"] if x)),
-                "score": f"{row['score']:.4f}",
-                "evidence": "|".join(sorted(x for x in row["evidence"] if x)),
-            }
-        )
-
-    for out in (out_path, out_plus):
-        with out.open("w", encoding="utf-8", newline="") as f:
-            w = csv.DictWriter(
-                f,
-                fieldnames=[
-                    "head",
-                    "relation",
-                    "tail",
-                    "source",
-                    "score",
-                    "evidence",
-                ],
+                entry[1].add(src)
+                entry[2].add(ev)
+                if score > entry[0]:
+                    entry[0] = score
+
+    def _merged_rows():
+        for key in sorted(merged):
+            score, sources, evidence = merged[key]
+            yield (
+                key[0],
+                key[1],
+                key[2],
+                "|".join(sorted(x for x in sources if x)),
+                f"{score:.4f}",
+                "|".join(sorted(x for x in evidence if x)),
             )
-            w.writeheader()
-            for row in rows:
-                w.writerow(
-                    {
-                        "head": row["h"],
-                        "relation": row["r"],
-                        "tail": row["t"],
-                        "source": row["source"],
-                        "score": row["score"],
-                        "evidence": row["evidence"],
-                    }
-                )
+
+    rows_written = write_csv_rows(
+        out_path,
+        ["head", "relation", "tail", "source", "score", "evidence"],
+        _merged_rows(),
+    )
+    # The .plus file starts identical but is patched in place downstream (DDI patch),
+    # so it must be an independent copy rather than a hardlink.
+    shutil.copyfile(out_path, out_plus)
 
     report = {
         "stage": "05_merge_edges",
@@ -116,7 +99,7 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 0)
             "sider": str(p2),
             "ctd": str(p3),
         },
-        "counts": {"rows_seen": seen_rows, "rows_written": len(rows)},
+        "counts": {"rows_seen": seen_rows, "rows_written": rows_written},
         "outputs": {
             "kg_edges_merged": str(out_path),
             "kg_edges_merged_plus": str(out_plus),
@@ -1,13 +1,92 @@
 from __future__ import annotations
 
 import argparse
-import json
 from pathlib import Path
+from typing import Iterable, Iterator
 
 try:
-    from .common import ensure_files, iter_rrf, write_json
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
 except ImportError:
-    from kb.build.common import ensure_files, iter_rrf, write_json
+    pa = None
+    pc = None
+    pacsv = None
+
+try:
+    from .common import ensure_files, iter_entity_catalog, iter_rrf_bytes, write_json
+except ImportError:
+    from kb.build.common import ensure_files, iter_entity_catalog, iter_rrf_bytes, write_json
+
+
+def _iter_mrconso_arrow(
+    path: Path, cuis: Iterable[str], progress_every: int, counts: dict
+) -> Iterator[tuple[str, bytes]]:
+    """Yields (CUI, raw STR) for English rows of known CUIs via pyarrow's C++ CSV reader.
+
+    Only CUI, LAT and STR are materialized and the LAT/CUI filter runs as Arrow
+    compute kernels, so Python only sees surviving rows. Every physical row,
+    including malformed ones the reader skips, is added to ``counts["rows"]``.
+    """
+    names = ["f0", "f1", "f14"]
+    invalid = 0
+
+    def _skip(_row) -> str:
+        nonlocal invalid
+        invalid += 1
+        return "skip"
+
+    reader = pacsv.open_csv(
+        str(path),
+        read_options=pacsv.ReadOptions(autogenerate_column_names=True, block_size=64 << 20),
+        parse_options=pacsv.ParseOptions(
+            delimiter="|",
+            quote_char=False,
+            ignore_empty_lines=False,
+            invalid_row_handler=_skip,
+        ),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=names,
+            column_types={"f0": pa.string(), "f1": pa.string(), "f14": pa.binary()},
+            strings_can_be_null=False,
+        ),
+    )
+    value_set = pa.array(sorted(cuis), type=pa.string())
+    seen_rows = 0
+    next_report = progress_every
+    for batch in reader:
+        seen_rows += batch.num_rows
+        cui = pc.utf8_upper(pc.utf8_trim_whitespace(batch.column("f0")))
+        lat = pc.utf8_upper(pc.utf8_trim_whitespace(batch.column("f1")))
+        mask = pc.and_(pc.equal(lat, "ENG"), pc.is_in(cui, value_set=value_set))
+        yield from zip(
+            pc.filter(cui, mask).to_pylist(),
+            pc.filter(batch.column("f14"), mask).to_pylist(),
+        )
+        if progress_every and seen_rows >= next_report:
+            print(f"[{path.name}] read {seen_rows:,} lines")
+            next_report = (seen_rows // progress_every + 1) * progress_every
+    counts["rows"] = seen_rows + invalid
+
+
+def _iter_mrconso_bytes(
+    path: Path, cuis: Iterable[str], progress_every: int, counts: dict
+) -> Iterator[tuple[str, bytes]]:
+    """Yields (CUI, raw STR) for English rows of known CUIs, matching on undecoded bytes."""
+    # The exact-bytes checks are fast paths; strip/upper variants still match.
+    cui_bytes = {cui.encode("utf-8"): cui for cui in cuis}
+    rows = 0
+    for fields in iter_rrf_bytes(path, progress_every=progress_every, maxsplit=15):
+        rows += 1
+        if len(fields) < 15:
+            continue
+        lat = fields[1]
+        if lat != b"ENG" and lat.strip().upper() != b"ENG":
+            continue
+        cui = cui_bytes.get(fields[0]) or cui_bytes.get(fields[0].strip().upper())
+        if cui:
+            yield cui, fields[14]
+    counts["rows"] = rows
 
 
 def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 0) -> dict:
@@ -20,76 +99,90 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 0)
     overlay_path = out_dir / "umls_dict.overlay.json"
     report_path = out_dir / "stage_06_report.json"
 
-    kg_to_cui: dict[str, str] = {}
-    kg_to_catalog_syns: dict[str, set[str]] = {}
-    kg_to_canonical: dict[str, str] = {}
+    # Entity fields live in parallel lists indexed by position rather than in
+    # per-kg_id dicts of sets; catalog synonyms are deduplicated tuples.
+    kg_ids: list[str] = []
+    kg_cuis: list[str] = []
+    kg_canonicals: list[str] = []
+    kg_catalog_syns: list[tuple[str, ...]] = []
+    kg_pos: dict[str, int] = {}
     rows = 0
-    with entity_catalog.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            rows += 1
-            row = json.loads(line)
-            kg_id = row["kg_id"]
-            cui = (row.get("cui") or "").strip().upper()
-            if not cui:
-                continue
-            syns = {
+    for row in iter_entity_catalog(entity_catalog, ["kg_id", "cui", "canonical_name", "synonyms"]):
+        rows += 1
+        kg_id = row["kg_id"]
+        cui = (row.get("cui") or "").strip().upper()
+        if not cui:
+            continue
+        syns = tuple(
+            dict.fromkeys(
                 s.strip()
-                for s in row.get("synonyms", [])
+                for s in row.get("synonyms") or []
                 if isinstance(s, str) and s.strip()
-            }
-            canonical = (row.get("canonical_name") or "").strip()
-            kg_to_cui[kg_id] = cui
-            kg_to_catalog_syns[kg_id] = syns
-            kg_to_canonical[kg_id] = canonical
-
-    cui_to_kg: dict[str, str] = {cui: kg for kg, cui in kg_to_cui.items()}
-    base_sets: dict[str, set[str]] = {kg: set() for kg in kg_to_cui}
-
-    mrconso_rows = 0
+            )
+        )
+        canonical = (row.get("canonical_name") or "").strip()
+        i = kg_pos.get(kg_id)
+        if i is None:
+            kg_pos[kg_id] = len(kg_ids)
+            kg_ids.append(kg_id)
+            kg_cuis.append(cui)
+            kg_canonicals.append(canonical)
+            kg_catalog_syns.append(syns)
+        else:
+            kg_cuis[i] = cui
+            kg_canonicals[i] = canonical
+            kg_catalog_syns[i] = syns
+
+    cui_to_pos: dict[str, int] = {cui: i for i, cui in enumerate(kg_cuis)}
+    # Only entities MRCONSO (or a canonical name) actually hits get a set.
+    base_sets: dict[int, set[str]] = {}
+
+    mrconso_counts = {"rows": 0}
+    if pacsv is not None:
+        english_rows = _iter_mrconso_arrow(mrconso, cui_to_pos, progress_every, mrconso_counts)
+    else:
+        english_rows = _iter_mrconso_bytes(mrconso, cui_to_pos, progress_every, mrconso_counts)
     mrconso_english = 0
-    for fields in iter_rrf(mrconso, progress_every=progress_every):
-        mrconso_rows += 1
-        if len(fields) < 15:
+    for cui, raw_text in english_rows:
+        text = raw_text.decode("utf-8", errors="ignore").strip()
+        if not text:
             continue
-        cui = fields[0].strip().upper()
-        lat = fields[1].strip().upper()
-        text = fields[14].strip()
-        if not cui or not text or lat != "ENG":
-            continue
-        kg_id = cui_to_kg.get(cui)
-        if not kg_id:
-            continue
-        base_sets[kg_id].add(text)
+        i = cui_to_pos[cui]
+        base = base_sets.get(i)
+        if base is None:
+            base = base_sets[i] = set()
+        base.add(text)
         mrconso_english += 1
+    mrconso_rows = mrconso_counts["rows"]
 
-    for kg_id, canonical in kg_to_canonical.items():
+    for i, canonical in enumerate(kg_canonicals):
         if canonical:
-            base_sets.setdefault(kg_id, set()).add(canonical)
+            base_sets.setdefault(i, set()).add(canonical)
 
     base_dict: dict[str, list[str]] = {}
     overlay_dict: dict[str, list[str]] = {}
     total_base_synonyms = 0
     total_overlay_synonyms = 0
 
-    for kg_id in sorted(base_sets):
-        base_sorted = sorted(base_sets[kg_id], key=str.casefold)
-        if base_sorted:
+    for i in sorted(range(len(kg_ids)), key=kg_ids.__getitem__):
+        kg_id = kg_ids[i]
+        base = base_sets.pop(i, None)
+        catalog_syns = kg_catalog_syns[i]
+        if base:
+            base_sorted = sorted(base, key=str.casefold)
             base_dict[kg_id] = base_sorted
             total_base_synonyms += len(base_sorted)
-        catalog_syns = kg_to_catalog_syns.get(kg_id, set())
-        extra = sorted((catalog_syns - set(base_sorted)), key=str.casefold)
+            # str caches its hash, so each membership probe is a cached-hash
+            # lookup; cheaper than a Python-level merge over the sorted lists.
+            catalog_syns = [s for s in catalog_syns if s not in base]
+        extra = sorted(catalog_syns, key=str.casefold)
         if extra:
             overlay_dict[kg_id] = extra
             total_overlay_synonyms += len(extra)
 
-    dict_path.write_text(json.dumps(base_dict, ensure_ascii=False, indent=2), encoding="utf-8")
-    overlay_path.write_text(
-        json.dumps(overlay_dict, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+    # Both files are only ever loaded with a JSON parser; skip the indentation.
+    write_json(dict_path, base_dict, compact=True)
+    write_json(overlay_path, overlay_dict, compact=True)
 
     report = {
         "stage": "06_build_umls_dict_and_overlay",
@@ -97,7 +190,7 @@ def build(raw_root: Path, out_dir: Path, version: str, progress_every: int = 0)
         "inputs": {"entity_catalog": str(entity_catalog), "mrconso": str(mrconso)},
         "counts": {
             "entities_rows_seen": rows,
-            "entities_with_cui": len(kg_to_cui),
+            "entities_with_cui": len(kg_ids),
             "mrconso_rows_seen": mrconso_rows,
             "mrconso_english_rows_mapped": mrconso_english,
             "total_base_synonyms": total_base_synonyms,
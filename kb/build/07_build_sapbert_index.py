@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import argparse
-import json
 from pathlib import Path
 
 import faiss
@@ -10,9 +9,9 @@ import torch
 from transformers import AutoModel, AutoTokenizer
 
 try:
-    from .common import ensure_files, write_json
+    from .common import dumps_json_line, ensure_files, iter_entity_catalog, write_json
 except ImportError:
-    from kb.build.common import ensure_files, write_json
+    from kb.build.common import dumps_json_line, ensure_files, iter_entity_catalog, write_json
 
 
 def _l2_normalize(x: np.ndarray) -> np.ndarray:
@@ -21,24 +20,94 @@ def _l2_normalize(x: np.ndarray) -> np.ndarray:
     return x / denom
 
 
-def _encode(model, tokenizer, texts: list[str], batch_size: int, max_length: int, device: str) -> np.ndarray:
-    out = []
-    with torch.no_grad():
+def _write_ip_index(emb: np.ndarray, dim: int, path: Path, fp16: bool = False) -> None:
+    # Flat "add" is a plain append, so the only cost worth avoiding is faiss
+    # converting a non-contiguous or non-float32 input behind our back.
+    if fp16:
+        # Vectors stored as float16: half the file size and scan bandwidth.
+        # Queries are still passed as L2-normalized float32.
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexFlatIP(dim)
+    if len(emb):
+        x = np.ascontiguousarray(emb, dtype=np.float32)
+        if not index.is_trained:
+            index.train(x)
+        index.add(x)
+    faiss.write_index(index, str(path))
+
+
+def _write_rows_jsonl(rows: list[dict], path: Path) -> None:
+    path.write_bytes(b"".join(dumps_json_line(r) for r in rows))
+
+
+def _pad_batch(tokens, idx: np.ndarray, width: int, pad_id: int) -> dict:
+    """Right-pads pre-tokenized rows ``idx`` to ``width`` as int64 tensors.
+
+    Same result as ``tokenizer.pad`` for BERT inputs, without its per-call
+    Python bookkeeping.
+    """
+    out = {}
+    for key, seqs in tokens.items():
+        arr = np.full((len(idx), width), pad_id if key == "input_ids" else 0, dtype=np.int64)
+        for r, j in enumerate(idx):
+            seq = seqs[j]
+            arr[r, : len(seq)] = seq
+        out[key] = torch.from_numpy(arr)
+    return out
+
+
+def _encode(
+    model,
+    tokenizer,
+    texts: list[str],
+    batch_size: int,
+    max_length: int,
+    device: str,
+    fp16: bool = False,
+) -> np.ndarray:
+    # Batches are scattered straight into their input positions, so there is no
+    # per-batch list, no vstack copy and no final un-permute.
+    emb = np.empty((len(texts), model.config.hidden_size), dtype=np.float32)
+    if not texts:
+        return emb
+    # Tokenize once without padding (one bulk call into the Rust tokenizer), then
+    # batch in token-length order so each batch pads only to its own longest member.
+    tokens = tokenizer(texts, padding=False, truncation=True, max_length=max_length)
+    lengths = np.fromiter((len(ids) for ids in tokens["input_ids"]), dtype=np.int64, count=len(texts))
+    order = np.argsort(lengths, kind="stable")
+
+    on_cuda = device == "cuda"
+    # On CUDA, batch i+1 is padded into pinned memory and copied on a side stream
+    # while batch i runs, so the host->device transfer hides under compute.
+    copy_stream = torch.cuda.Stream() if on_cuda else None
+
+    def _stage(i: int) -> tuple[np.ndarray, dict]:
+        idx = order[i : i + batch_size]
+        enc = _pad_batch(tokens, idx, int(lengths[idx].max()), tokenizer.pad_token_id)
+        if on_cuda:
+            with torch.cuda.stream(copy_stream):
+                enc = {k: v.pin_memory().to(device, non_blocking=True) for k, v in enc.items()}
+        return idx, enc
+
+    # FP16 autocast runs the BERT matmuls on tensor cores; only meaningful on CUDA.
+    autocast = torch.autocast("cuda", dtype=torch.float16, enabled=fp16 and on_cuda)
+    with torch.inference_mode(), autocast:
+        staged = _stage(0)
         for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            enc = tokenizer(
-                batch,
-                padding=True,
-                truncation=True,
-                max_length=max_length,
-                return_tensors="pt",
-            )
-            enc = {k: v.to(device) for k, v in enc.items()}
-            hid = model(**enc).last_hidden_state[:, 0, :]
+            idx, enc = staged
+            if on_cuda:
+                compute_stream = torch.cuda.current_stream()
+                compute_stream.wait_stream(copy_stream)
+                for v in enc.values():
+                    v.record_stream(compute_stream)
+            if i + batch_size < len(texts):
+                staged = _stage(i + batch_size)
+            hid = model(**enc).last_hidden_state[:, 0, :].float()
             hid = torch.nn.functional.normalize(hid, p=2, dim=1)
-            out.append(hid.cpu().numpy())
-            print(f"[sapbert] encoded {min(i + len(batch), len(texts)):,}/{len(texts):,}")
-    return np.vstack(out) if out else np.zeros((0, 768), dtype=np.float32)
+            emb[idx] = hid.cpu().numpy()
+            print(f"[sapbert] encoded {min(i + len(idx), len(texts)):,}/{len(texts):,}")
+    return emb
 
 
 def build(
@@ -49,6 +118,9 @@ def build(
     batch_size: int = 64,
     max_length: int = 64,
     local_files_only: bool = True,
+    fp16: bool = True,
+    fp16_index: bool = False,
+    compile_model: bool = False,
 ) -> dict:
     _ = raw_root
     entity_catalog = out_dir / "entity_catalog.jsonl"
@@ -61,64 +133,80 @@ def build(
     report_path = out_dir / "stage_07_report.json"
 
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=local_files_only)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=local_files_only, use_fast=True)
     model = AutoModel.from_pretrained(model_name, local_files_only=local_files_only).to(device)
     model.eval()
+    fp16 = fp16 and device == "cuda"
+    if fp16:
+        model = model.half()
+    if compile_model and hasattr(torch, "compile"):
+        # Fuses the encoder's kernels. dynamic=True because length bucketing gives
+        # every batch its own sequence length; CUDA-graph modes would re-record each.
+        model = torch.compile(model, dynamic=True)
 
     rows = []
-    with entity_catalog.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            row = json.loads(line)
-            kg_id = row["kg_id"]
-            et = row.get("entity_type", "entity")
-            canonical = row.get("canonical_name", "")
-            for s in row.get("synonyms", []):
-                rows.append(
-                    {
-                        "kg_id": kg_id,
-                        "entity_type": et,
-                        "surface": s,
-                        "canonical_name": canonical,
-                    }
-                )
+    catalog_columns = ["kg_id", "entity_type", "canonical_name", "synonyms"]
+    for row in iter_entity_catalog(entity_catalog, catalog_columns):
+        kg_id = row["kg_id"]
+        et = row.get("entity_type", "entity")
+        canonical = row.get("canonical_name", "")
+        for s in row.get("synonyms", []):
+            rows.append(
+                {
+                    "kg_id": kg_id,
+                    "entity_type": et,
+                    "surface": s,
+                    "canonical_name": canonical,
+                }
+            )
     rows.sort(key=lambda r: (r["entity_type"], r["kg_id"], r["surface"].lower()))
-    texts = [r["surface"] for r in rows]
-    emb = _encode(model, tokenizer, texts, batch_size=batch_size, max_length=max_length, device=device)
-    emb = _l2_normalize(emb.astype(np.float32))
 
-    dim = emb.shape[1] if emb.size else 768
-    index = faiss.IndexFlatIP(dim)
-    if len(emb):
-        index.add(emb)
-    faiss.write_index(index, str(out_index))
+    # The same surface recurs across rows and sub-indexes; encode each one once and gather.
+    surface_ix: dict[str, int] = {}
+    for r in rows:
+        surface_ix.setdefault(r["surface"], len(surface_ix))
+    uniq_emb = _encode(
+        model,
+        tokenizer,
+        list(surface_ix),
+        batch_size=batch_size,
+        max_length=max_length,
+        device=device,
+        fp16=fp16,
+    )
+    uniq_emb = _l2_normalize(uniq_emb.astype(np.float32))
+
+    def _gather(sub_rows: list[dict]) -> np.ndarray:
+        ix = np.fromiter((surface_ix[r["surface"]] for r in sub_rows), dtype=np.int64, count=len(sub_rows))
+        return uniq_emb[ix]
+
+    # Encoding is done; release the model (and its GPU memory) before building indexes.
+    del model
+    if device == "cuda":
+        torch.cuda.empty_cache()
+
+    emb = _gather(rows)
+    dim = uniq_emb.shape[1]
+    _write_ip_index(emb, dim, out_index, fp16=fp16_index)
 
-    with out_rows.open("w", encoding="utf-8", newline="\n") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    _write_rows_jsonl(rows, out_rows)
 
     # Runtime compatibility sub-indexes expected by current SapBERTLinkerV2
     for etype in ("Drug", "Disease"):
         sub_rows = [r for r in rows if r["entity_type"].lower() == etype.lower()]
-        texts = [r["surface"] for r in sub_rows]
-        sub_emb = _encode(model, tokenizer, texts, batch_size=batch_size, max_length=max_length, device=device)
-        sub_emb = _l2_normalize(sub_emb.astype(np.float32)) if len(sub_emb) else np.zeros((0, dim), dtype=np.float32)
+        sub_emb = _gather(sub_rows)
         sub_dir = sapbert_root / etype
         sub_dir.mkdir(parents=True, exist_ok=True)
-        sub_index = faiss.IndexFlatIP(dim)
-        if len(sub_emb):
-            sub_index.add(sub_emb)
-        faiss.write_index(sub_index, str(sub_dir / "index.faiss"))
-        with (sub_dir / "rows.jsonl").open("w", encoding="utf-8", newline="\n") as f:
-            for r in sub_rows:
-                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        _write_ip_index(sub_emb, dim, sub_dir / "index.faiss", fp16=fp16_index)
+        _write_rows_jsonl(sub_rows, sub_dir / "rows.jsonl")
 
     manifest = {
         "version": version,
         "embedding_model": model_name,
         "embedding_dim": dim,
         "device": device,
+        "fp16": fp16,
+        "index_dtype": "float16" if fp16_index else "float32",
         "rows": len(rows),
         "index_path": str(out_index),
         "rows_path": str(out_rows),
@@ -129,7 +217,7 @@ def build(
         "stage": "07_build_sapbert_index",
         "version": version,
         "inputs": {"entity_catalog": str(entity_catalog)},
-        "counts": {"rows": len(rows), "embedding_dim": dim},
+        "counts": {"rows": len(rows), "unique_surfaces": len(surface_ix), "embedding_dim": dim},
         "outputs": {"index": str(out_index), "rows": str(out_rows), "manifest": str(sapbert_root / "manifest.json")},
     }
     write_json(report_path, report)
@@ -145,6 +233,9 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--batch_size", type=int, default=64)
     ap.add_argument("--max_length", type=int, default=64)
     ap.add_argument("--local_files_only", action="store_true", default=False)
+    ap.add_argument("--fp32", action="store_true", help="Disable FP16 inference on CUDA.")
+    ap.add_argument("--fp16_index", action="store_true", help="Store index vectors as float16.")
+    ap.add_argument("--compile", action="store_true", help="Run the encoder through torch.compile.")
     return ap.parse_args()
 
 
@@ -158,6 +249,9 @@ def main() -> None:
         batch_size=args.batch_size,
         max_length=args.max_length,
         local_files_only=args.local_files_only,
+        fp16=not args.fp32,
+        fp16_index=args.fp16_index,
+        compile_model=args.compile,
     )
     print(
         f"[07] wrote {report['outputs']['index']} "
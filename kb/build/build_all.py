@@ -2,13 +2,15 @@ from __future__ import annotations
 
 import argparse
 import importlib
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
 try:
-    from .common import sha256_file, write_json
+    from .common import loads_json, sha256_file, write_json
 except ImportError:
-    from kb.build.common import sha256_file, write_json
+    from kb.build.common import loads_json, sha256_file, write_json
 
 
 STAGES = [
@@ -20,10 +22,47 @@ STAGES = [
     "06_build_umls_dict_and_overlay",
 ]
 
+# Stages whose main scan can be sharded across processes.
+SHARDED_STAGES = {"02_build_edges_umls", "03_build_edges_sider", "04_build_edges_ctd"}
 
-def _run_stage(mod_name: str, raw_root: Path, out_dir: Path, version: str, progress_every: int) -> dict:
+
+def _run_stage(
+    mod_name: str, raw_root: Path, out_dir: Path, version: str, progress_every: int, workers: int = 1
+) -> dict:
     mod = importlib.import_module(f"kb.build.{mod_name}")
-    return mod.build(raw_root=raw_root, out_dir=out_dir, version=version, progress_every=progress_every)
+    kwargs = {"workers": workers} if mod_name in SHARDED_STAGES else {}
+    return mod.build(
+        raw_root=raw_root, out_dir=out_dir, version=version, progress_every=progress_every, **kwargs
+    )
+
+
+def _previous_file_hashes(manifest_path: Path) -> dict:
+    try:
+        return loads_json(manifest_path.read_bytes()).get("files", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def _hash_outputs(paths: list[Path], previous: dict) -> dict:
+    """Hashes ``paths``, reusing a previous manifest's digest when size and mtime match."""
+    stats = {p: p.stat() for p in paths if p.exists()}
+    todo = []
+    file_hashes = {}
+    for p, st in stats.items():
+        old = previous.get(str(p)) or {}
+        if old.get("sha256") and old.get("bytes") == st.st_size and old.get("mtime_ns") == st.st_mtime_ns:
+            file_hashes[str(p)] = old["sha256"]
+        else:
+            todo.append(p)
+    # SHA-256 releases the GIL, so the remaining outputs hash concurrently on threads.
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(len(todo), os.cpu_count() or 1)) as pool:
+            for p, digest in zip(todo, pool.map(sha256_file, todo)):
+                file_hashes[str(p)] = digest
+    return {
+        str(p): {"sha256": file_hashes[str(p)], "bytes": st.st_size, "mtime_ns": st.st_mtime_ns}
+        for p, st in stats.items()
+    }
 
 
 def build_all(
@@ -35,14 +74,33 @@ def build_all(
     batch_size: int,
     skip_sapbert: bool,
     local_files_only: bool,
+    workers: int = 1,
 ) -> dict:
     version_dir = out_root / version
     version_dir.mkdir(parents=True, exist_ok=True)
 
     stage_reports = []
-    for name in STAGES:
-        print(f"[build_all] running {name}")
-        stage_reports.append(_run_stage(name, raw_root, version_dir, version, progress_every))
+    if workers > 1:
+        # 02-04 read disjoint raw inputs and only depend on stage 01, so they run
+        # side by side, splitting the worker budget; reports keep STAGES order.
+        edge_stages = [name for name in STAGES if name in SHARDED_STAGES]
+        stage_workers = max(1, workers // len(edge_stages))
+        for name in STAGES:
+            if name == edge_stages[0]:
+                print(f"[build_all] running {', '.join(edge_stages)} concurrently")
+                with ProcessPoolExecutor(max_workers=len(edge_stages)) as ex:
+                    futs = [
+                        ex.submit(_run_stage, n, raw_root, version_dir, version, progress_every, stage_workers)
+                        for n in edge_stages
+                    ]
+                    stage_reports.extend(f.result() for f in futs)
+            elif name not in SHARDED_STAGES:
+                print(f"[build_all] running {name}")
+                stage_reports.append(_run_stage(name, raw_root, version_dir, version, progress_every))
+    else:
+        for name in STAGES:
+            print(f"[build_all] running {name}")
+            stage_reports.append(_run_stage(name, raw_root, version_dir, version, progress_every, workers))
 
     if not skip_sapbert:
         print("[build_all] running 07_build_sapbert_index")
@@ -60,6 +118,7 @@ def build_all(
 
     tracked_outputs = [
         version_dir / "entity_catalog.jsonl",
+        version_dir / "entity_catalog.parquet",
         version_dir / "kg_edges.umls.csv",
         version_dir / "kg_edges.sider.csv",
         version_dir / "kg_edges.ctd.csv",
@@ -77,10 +136,8 @@ def build_all(
             ]
         )
 
-    file_hashes = {}
-    for p in tracked_outputs:
-        if p.exists():
-            file_hashes[str(p)] = {"sha256": sha256_file(p), "bytes": p.stat().st_size}
+    manifest_path = version_dir / "build_manifest.json"
+    file_hashes = _hash_outputs(tracked_outputs, _previous_file_hashes(manifest_path))
 
     manifest = {
         "builder": "graphcorag_kb_build",
@@ -91,7 +148,7 @@ def build_all(
         "stages": stage_reports,
         "files": file_hashes,
     }
-    write_json(version_dir / "build_manifest.json", manifest)
+    write_json(manifest_path, manifest)
     return manifest
 
 
@@ -109,6 +166,15 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--batch_size", type=int, default=64)
     ap.add_argument("--skip_sapbert", action="store_true")
     ap.add_argument("--local_files_only", action="store_true", default=False)
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Process budget for stages 02-04: above 1 they run concurrently, each sharding "
+            "its MRREL/SIDER/CTD scan over workers // 3 processes (gzip inputs stay serial)."
+        ),
+    )
     return ap.parse_args()
 
 
@@ -123,6 +189,7 @@ def main() -> None:
         batch_size=args.batch_size,
         skip_sapbert=args.skip_sapbert,
         local_files_only=args.local_files_only,
+        workers=args.workers,
     )
     print(f"[build_all] done: {manifest['output_dir']}")
     print(f"[build_all] manifest: {Path(manifest['output_dir']) / 'build_manifest.json'}")
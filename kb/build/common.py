@@ -3,10 +3,34 @@ from __future__ import annotations
 import csv
 import gzip
 import hashlib
+import io
 import json
+import multiprocessing
+import os
+import queue
 import re
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, Iterator
+from typing import Callable, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+_WS_RE = re.compile(r"\s+")
+_NON_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+# Per-process context for map_line_shards workers.
+_SHARD_CTX: dict = {}
 
 
 def ensure_files(paths: Iterable[Path]) -> None:
@@ -21,41 +45,206 @@ def open_text_auto(path: Path):
     return path.open("r", encoding="utf-8", errors="ignore", newline="")
 
 
-def iter_rrf(path: Path, progress_every: int = 500000) -> Iterator[list[str]]:
-    with open_text_auto(path) as f:
-        for i, line in enumerate(f, start=1):
+# Large read buffer for the line scanners: far fewer read syscalls on multi-GB RRF files.
+_READ_BUFFER = 4 << 20
+
+
+def open_binary_auto(path: Path):
+    """Opens ``path`` (optionally .gz) for binary line reads through a 4 MiB buffer."""
+    raw = open(path, "rb", buffering=_READ_BUFFER)
+    if path.suffix.lower() == ".gz":
+        return io.BufferedReader(gzip.GzipFile(fileobj=raw), buffer_size=_READ_BUFFER)
+    return raw
+
+
+def prefetch_files(paths: Iterable[Path]) -> None:
+    """Hints the OS to read ``paths`` ahead into the page cache (no-op without posix_fadvise)."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    def _advise(targets: list[Path]) -> None:
+        for p in targets:
+            try:
+                fd = os.open(p, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    threading.Thread(target=_advise, args=(list(paths),), daemon=True).start()
+
+
+def iter_lines(
+    path: Path,
+    progress_every: int = 500000,
+    byte_range: tuple[int, int] | None = None,
+) -> Iterator[str]:
+    """Yields text lines, optionally only those starting inside ``byte_range``.
+
+    Lines are split on ``\n`` in binary and decoded one by one, so a serial scan
+    and a sharded one see exactly the same lines.
+    """
+    if byte_range is None:
+        with open_binary_auto(path) as f:
+            for i, raw in enumerate(f, start=1):
+                if progress_every and i % progress_every == 0:
+                    print(f"[{path.name}] read {i:,} lines")
+                yield raw.decode("utf-8", errors="ignore")
+        return
+    start, end = byte_range
+    with open(path, "rb", buffering=_READ_BUFFER) as f:
+        f.seek(start)
+        pos = start
+        i = 0
+        while pos < end:
+            raw = f.readline()
+            if not raw:
+                break
+            pos += len(raw)
+            i += 1
             if progress_every and i % progress_every == 0:
-                print(f"[{path.name}] read {i:,} lines")
-            yield line.rstrip("\n").split("|")
+                print(f"[{path.name}@{start}] read {i:,} lines")
+            yield raw.decode("utf-8", errors="ignore")
+
 
+def iter_rrf(
+    path: Path,
+    progress_every: int = 500000,
+    maxsplit: int = -1,
+    byte_range: tuple[int, int] | None = None,
+) -> Iterator[list[str]]:
+    """Yields pipe-split rows; ``maxsplit`` leaves unused trailing columns unsplit."""
+    for line in iter_lines(path, progress_every, byte_range):
+        yield line.rstrip("\n").split("|", maxsplit)
 
-def iter_tsv(path: Path, progress_every: int = 500000) -> Iterator[list[str]]:
-    with open_text_auto(path) as f:
+
+def iter_rrf_bytes(path: Path, progress_every: int = 500000, maxsplit: int = -1) -> Iterator[list[bytes]]:
+    """Like ``iter_rrf`` but yields undecoded fields, so callers decode only rows they keep."""
+    with open_binary_auto(path) as f:
         for i, line in enumerate(f, start=1):
             if progress_every and i % progress_every == 0:
                 print(f"[{path.name}] read {i:,} lines")
-            yield line.rstrip("\n").split("\t")
+            yield line.rstrip(b"\n").split(b"|", maxsplit)
+
+
+def iter_tsv(
+    path: Path,
+    progress_every: int = 500000,
+    byte_range: tuple[int, int] | None = None,
+) -> Iterator[list[str]]:
+    for line in iter_lines(path, progress_every, byte_range):
+        yield line.rstrip("\n").split("\t")
+
+
+def split_line_ranges(path: Path, parts: int) -> list[tuple[int, int]]:
+    """Splits ``path`` into up to ``parts`` byte ranges aligned to line starts."""
+    size = path.stat().st_size
+    bounds = [0]
+    with path.open("rb") as f:
+        for k in range(1, parts):
+            f.seek(max(size * k // parts, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _init_shard_worker(ctx: dict) -> None:
+    _SHARD_CTX.clear()
+    _SHARD_CTX.update(ctx)
+
+
+def _run_shard(scan: Callable, byte_range: tuple[int, int]):
+    return scan(_SHARD_CTX, byte_range)
+
+
+def has_quoted_newline(path: Path) -> bool:
+    """True if a quoted CSV field in ``path`` spans lines.
+
+    Escaped quotes come in pairs, so a physical line with an odd number of
+    ``"`` characters opens or closes a field that continues on another line.
+    """
+    with open(path, "rb", buffering=_READ_BUFFER) as f:
+        return any(line.count(b'"') & 1 for line in f)
+
+
+def map_line_shards(
+    path: Path, workers: int, scan: Callable, ctx: dict, quoted_csv: bool = False
+) -> list:
+    """Runs ``scan(ctx, byte_range)`` over line-aligned shards of ``path``.
+
+    Results are returned in file order. Compressed inputs cannot be split and
+    are scanned in-process with ``byte_range=None``, as is everything when
+    ``workers <= 1``. Shards are cut at raw newlines, so a ``quoted_csv`` input
+    is only split once ``has_quoted_newline`` rules out multi-line records.
+    """
+    ranges = [] if workers <= 1 or path.suffix.lower() == ".gz" else split_line_ranges(path, workers)
+    if len(ranges) > 1 and quoted_csv and has_quoted_newline(path):
+        print(f"[{path.name}] quoted fields span lines; scanning serially")
+        ranges = []
+    if len(ranges) <= 1:
+        return [scan(ctx, None)]
+    with multiprocessing.Pool(len(ranges), initializer=_init_shard_worker, initargs=(ctx,)) as pool:
+        return pool.starmap(_run_shard, [(scan, r) for r in ranges])
 
 
 def slugify(text: str) -> str:
-    s = re.sub(r"\s+", " ", (text or "").strip().lower())
-    s = re.sub(r"[^a-z0-9]+", "_", s)
-    s = re.sub(r"_+", "_", s).strip("_")
+    # Whitespace and "_" both fall in the non-slug class, so one pass collapses them.
+    s = _NON_SLUG_RE.sub("_", (text or "").lower()).strip("_")
     return s or "unknown"
 
 
+@lru_cache(maxsize=1_000_000)
 def normalize_surface(text: str) -> str:
-    return re.sub(r"\s+", " ", (text or "").strip().lower())
+    return _WS_RE.sub(" ", (text or "").strip().lower())
+
+
+def loads_json(data: str | bytes) -> object:
+    """Parses one JSON document (e.g. a JSONL line); orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_json_line(obj: object) -> bytes:
+    """
+    Compact UTF-8 JSON plus newline; orjson when available.
+
+    Equivalent JSON for str/int/finite-float payloads, not identical bytes:
+    orjson spells some floats differently (1e-05 -> 0.00001) and writes
+    NaN/Infinity as null. Non-str dict keys are stringified as json does.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+    return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
 
+def write_json(path: Path, obj: dict, compact: bool = False) -> None:
+    """Writes ``obj`` as indent=2 JSON, or as one compact line for machine-read files.
 
-def write_json(path: Path, obj: dict) -> None:
+    With orjson the output is equivalent JSON, not identical bytes: some floats
+    are spelled differently and NaN/Infinity are written as null.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
+    if compact:
+        path.write_bytes(dumps_json_line(obj))
+        return
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
     path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
 def sha256_file(path: Path) -> str:
-    h = hashlib.sha256()
     with path.open("rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: reads into a reusable buffer in C, releasing the GIL.
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
         for chunk in iter(lambda: f.read(1024 * 1024), b""):
             h.update(chunk)
     return h.hexdigest()
@@ -63,37 +252,135 @@ def sha256_file(path: Path) -> str:
 
 def read_entity_catalog(path: Path) -> list[dict]:
     rows: list[dict] = []
-    with path.open("r", encoding="utf-8") as f:
+    with path.open("rb") as f:
         for line in f:
             line = line.strip()
             if line:
-                rows.append(json.loads(line))
+                rows.append(loads_json(line))
     return rows
 
 
-def write_edges_csv(path: Path, rows: Iterable[dict]) -> int:
+def _catalog_schema():
+    string_list = pa.list_(pa.string())
+    return pa.schema(
+        [
+            ("kg_id", pa.string()),
+            ("cui", pa.string()),
+            ("entity_type", pa.string()),
+            ("canonical_name", pa.string()),
+            ("synonyms", string_list),
+            ("sources", string_list),
+        ]
+    )
+
+
+def write_entity_catalog_parquet(path: Path, rows: list[dict]) -> Path | None:
+    """Writes the Parquet mirror of the JSONL catalog at ``path`` (same stem, ``.parquet``).
+
+    Without pyarrow nothing is written and any earlier mirror is removed so it
+    cannot be read in place of a newer JSONL.
+    """
+    pq_path = path.with_suffix(".parquet")
+    if pq is None:
+        pq_path.unlink(missing_ok=True)
+        return None
+    table = pa.Table.from_pylist(rows, schema=_catalog_schema())
+    pq.write_table(table, pq_path, compression="zstd", use_dictionary=True)
+    return pq_path
+
+
+def iter_entity_catalog(path: Path, columns: list[str]) -> Iterator[dict]:
+    """Yields catalog rows, reading only ``columns`` from the Parquet mirror when it is current.
+
+    Falls back to parsing the JSONL at ``path`` (all fields) when pyarrow or the
+    mirror is missing, or the mirror is older than the JSONL.
+    """
+    pq_path = path.with_suffix(".parquet")
+    if pq is not None and pq_path.exists() and pq_path.stat().st_mtime >= path.stat().st_mtime:
+        for batch in pq.ParquetFile(pq_path).iter_batches(columns=columns):
+            yield from batch.to_pylist()
+        return
+    with path.open("rb") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield loads_json(line)
+
+
+EDGE_COLUMNS = ["h", "r", "t", "source", "score", "evidence"]
+
+RELATION_CODES = {
+    "TREATS": 0,
+    "ADVERSE_EFFECT": 1,
+    "CONTRAINDICATED_FOR": 2,
+    "INTERACTS_WITH": 3,
+    "ASSOCIATED_WITH": 4,
+}
+
+
+def edge_key(kg_ix: dict[str, int], h: str, rel: str, t: str) -> int:
+    """Packs an (h, rel, t) edge into one int so dedup sets hold ints, not str tuples."""
+    return (kg_ix[h] << 40) | (kg_ix[t] << 8) | RELATION_CODES[rel]
+
+
+def write_csv_rows(path: Path, header: list[str], rows: Iterable[tuple], chunk_rows: int = 50000) -> int:
+    """Streams ``rows`` to CSV, formatting on this thread while a writer thread does the I/O.
+
+    Returns the number of data rows written.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
+    chunks: queue.Queue = queue.Queue(maxsize=8)
+    errors: list[BaseException] = []
+
+    def _drain(f) -> None:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                return
+            if not errors:
+                try:
+                    f.write(chunk)
+                except BaseException as e:  # keep draining so the producer never blocks
+                    errors.append(e)
+
     count = 0
-    with path.open("w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(
-            f, fieldnames=["h", "r", "t", "source", "score", "evidence"]
-        )
-        w.writeheader()
-        for row in rows:
-            w.writerow(row)
-            count += 1
+    with path.open("wb") as f:
+        writer_thread = threading.Thread(target=_drain, args=(f,), daemon=True)
+        writer_thread.start()
+        try:
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            w.writerow(header)
+            for row in rows:
+                w.writerow(row)
+                count += 1
+                if count % chunk_rows == 0:
+                    chunks.put(buf.getvalue().encode("utf-8"))
+                    buf = io.StringIO()
+                    w = csv.writer(buf)
+            chunks.put(buf.getvalue().encode("utf-8"))
+        finally:
+            chunks.put(None)
+            writer_thread.join()
+    if errors:
+        raise errors[0]
     return count
 
 
+def write_edges_csv(path: Path, rows: Iterable[tuple]) -> int:
+    """Writes edge tuples laid out as ``EDGE_COLUMNS``; returns the row count."""
+    return write_csv_rows(path, EDGE_COLUMNS, rows)
+
+
 def load_type_map_from_catalog(entity_catalog: Path) -> tuple[dict[str, str], dict[str, str]]:
     """Returns (cui_to_kgid, kgid_to_type)."""
     cui_to_kgid: dict[str, str] = {}
     kgid_to_type: dict[str, str] = {}
-    with entity_catalog.open("r", encoding="utf-8") as f:
+    with entity_catalog.open("rb") as f:
         for line in f:
             if not line.strip():
                 continue
-            row = json.loads(line)
+            row = loads_json(line)
             kgid = row["kg_id"]
             et = row.get("entity_type", "unknown")
             kgid_to_type[kgid] = et
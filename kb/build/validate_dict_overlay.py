@@ -41,17 +41,18 @@ def main() -> None:
     if not isinstance(base, dict) or not isinstance(overlay, dict):
         raise TypeError("Both dict and overlay files must be JSON objects")
 
-    base_norm: dict[str, list[str]] = {}
+    # Aliases are only counted and intersected below, so dedupe without sorting.
+    base_norm: dict[str, set[str]] = {}
     overlay_norm: dict[str, list[str]] = {}
 
     for kg_id, aliases in base.items():
         if not isinstance(kg_id, str):
             raise TypeError("Base dict keys must be strings")
-        base_norm[kg_id] = sorted(set(_as_str_list(aliases)), key=str.casefold)
+        base_norm[kg_id] = set(_as_str_list(aliases))
     for kg_id, aliases in overlay.items():
         if not isinstance(kg_id, str):
             raise TypeError("Overlay keys must be strings")
-        vals = sorted(set(_as_str_list(aliases)), key=str.casefold)
+        vals = list(dict.fromkeys(_as_str_list(aliases)))
         if vals:
             overlay_norm[kg_id] = vals
 
@@ -66,8 +67,7 @@ def main() -> None:
     overlap_keys: list[str] = []
     overlap_total = 0
     for kg_id, aliases in overlay_norm.items():
-        base_aliases = set(base_norm.get(kg_id, []))
-        inter = base_aliases.intersection(aliases)
+        inter = base_norm.get(kg_id, set()).intersection(aliases)
         if inter:
             overlap_keys.append(kg_id)
             overlap_total += len(inter)
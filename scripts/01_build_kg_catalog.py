@@ -1,4 +1,4 @@
-﻿import json, csv, re, os, sys
+﻿import json, csv, os, sys
 from collections import defaultdict
 
 PROJ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -25,8 +25,13 @@ def load_overlay():
         return {}
 
 
+_DASH_TO_SPACE = str.maketrans("-_", "  ")
+
+
 def normalize(s):
-    return re.sub(r"\s+", " ", s).strip()
+    # str.split() breaks on exactly the characters r"\s" matches, so this equals
+    # re.sub(r"\s+", " ", s).strip() without the regex engine.
+    return " ".join(s.split())
 
 
 keep_nodes = set()
@@ -60,13 +65,11 @@ for cui, names in base.items():
                         if isinstance(s, str):
                             cand.add(s)
     # small heuristics
-    norm = set()
-    for s in cand:
-        s2 = normalize(s)
-        norm.add(s2)
-        norm.add(s2.lower())
-        norm.add(re.sub(r"[-_]", " ", s2).lower())
-    aliases[cui] = sorted({a for a in norm if 2 <= len(a) <= 100})
+    norm = set(map(normalize, cand))
+    lowered = {s2.lower() for s2 in norm}
+    norm |= lowered
+    norm.update(low.translate(_DASH_TO_SPACE) for low in lowered)
+    aliases[cui] = sorted(a for a in norm if 2 <= len(a) <= 100)
 
 with open(OUTJS, "w", encoding="utf-8") as f:
     json.dump(aliases, f, ensure_ascii=False, indent=2)
@@ -7,27 +7,53 @@ ALIASES = os.path.join(PROJ, "out", "kg_catalog.aliases.json")
 OUT = os.path.join(PROJ, "out", "kg_catalog.sbert.npz")
 
 model_name = "cambridgeltl/SapBERT-from-PubMedBERT-fulltext"
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model = SentenceTransformer(model_name, device=device)
-
-with open(ALIASES, "r", encoding="utf-8") as f:
-    aliases = json.load(f)
-
-rows = []
-keys = []
-for cui, names in aliases.items():
-    for s in names:
-        keys.append((cui, s))
-        rows.append(s)
-
-print(f"[embed] encoding {len(rows)} alias strings with SapBERT on {device}…")
-emb = model.encode(
-    rows,
-    convert_to_numpy=True,
-    normalize_embeddings=True,
-    batch_size=128,
-    show_progress_bar=True,
-)
-
-np.savez_compressed(OUT, emb=emb, keys=np.array(keys, dtype=object))
-print(f"[embed] wrote {OUT} | shape={emb.shape}")
+
+
+def main():
+    n_gpus = torch.cuda.device_count()
+    device = "cuda" if n_gpus else "cpu"
+    model = SentenceTransformer(model_name, device=device)
+    if device == "cuda":
+        model = model.half()
+
+    with open(ALIASES, "r", encoding="utf-8") as f:
+        aliases = json.load(f)
+
+    rows = []
+    keys = []
+    for cui, names in aliases.items():
+        for s in names:
+            keys.append((cui, s))
+            rows.append(s)
+
+    if n_gpus > 1:
+        # One worker process per GPU; batches are sharded across them.
+        print(f"[embed] encoding {len(rows)} alias strings with SapBERT on {n_gpus} GPUs…")
+        pool = model.start_multi_process_pool([f"cuda:{i}" for i in range(n_gpus)])
+        try:
+            emb = model.encode_multi_process(
+                rows,
+                pool,
+                batch_size=128,
+                normalize_embeddings=True,
+            )
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        print(f"[embed] encoding {len(rows)} alias strings with SapBERT on {device}…")
+        emb = model.encode(
+            rows,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            batch_size=128,
+            show_progress_bar=True,
+        )
+
+    # float16 halves the archive; cast back to float32 before scoring.
+    np.savez_compressed(OUT, emb=emb.astype(np.float16), keys=np.array(keys, dtype=object))
+    print(f"[embed] wrote {OUT} | shape={emb.shape}")
+
+
+if __name__ == "__main__":
+    # The multi-GPU pool spawns workers that re-import this module.
+    main()
@@ -12,13 +12,18 @@ Designed for Graph-CORAG (Windows / PowerShell).
 
 import argparse
 import json
+import os
 import re
+import queue
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from collections import Counter
 from collections import defaultdict
 from datetime import datetime
+from functools import lru_cache
 
 # -----------------------------
 # Internal imports (MATCH TREE)
@@ -29,23 +34,67 @@ from analyzer.relation_classifier import RelationClassifier
 from kg_validation.kg_loader import KGLoader
 from kg_validation.kg_validator import KGValidator
 from passage_processing.claim_builder import build_claims, infer_predicate
+from jsonl_io import dumps_json_line, loads_json
+
 
 
-# -----------------------------
-# IO helpers
-# -----------------------------
 def load_jsonl(path):
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "rb") as f:
         for line in f:
             line = line.strip()
             if line:
-                yield json.loads(line)
+                yield loads_json(line)
 
 
 def write_jsonl(path, rows):
-    with open(path, "w", encoding="utf-8") as f:
+    # 1 MiB buffer: rows are small, so this batches many into each write().
+    with open(path, "wb", buffering=1 << 20) as f:
         for r in rows:
-            f.write(json.dumps(r) + "\n")
+            f.write(dumps_json_line(r))
+
+
+def completed_qids(path) -> set:
+    """qids already written to ``path``; a torn final row (crash mid-write) is cut off."""
+    done = set()
+    good = 0
+    with open(path, "r+b") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                done.add(loads_json(line)["qid"])
+            good += len(line)
+        f.truncate(good)
+    return done
+
+
+_ID_FIELD_RE = re.compile(rb'"id"\s*:\s*"([^"\\]*)"')
+
+
+def iter_corpus_rows(path, doc_ids):
+    """Yields corpus rows whose "id" is in ``doc_ids``, in file order.
+
+    When a line has a single plain ``"id": "..."`` field, its id is read from
+    the raw bytes and unwanted rows are skipped without being parsed; any
+    other line is parsed and checked as usual.
+    """
+    wanted = doc_ids if isinstance(doc_ids, (set, frozenset)) else set(doc_ids)
+    wanted_bytes = {d.encode("utf-8") for d in wanted if isinstance(d, str)}
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.count(b'"id"') == 1:
+                m = _ID_FIELD_RE.search(line)
+                if m is not None and m.group(1) not in wanted_bytes:
+                    continue
+            row = loads_json(line)
+            if row.get("id") in wanted:
+                yield row
+
+
+_NUM_RE = re.compile(r"\d+(?:\.\d+)?")
 
 
 def normalize_mention(text: str) -> str:
@@ -54,15 +103,6 @@ def normalize_mention(text: str) -> str:
     return " ".join(str(text).strip().split()).lower()
 
 
-def valid_mention(text: str) -> bool:
-    s = normalize_mention(text)
-    if len(s) < 3:
-        return False
-    if re.fullmatch(r"\d+(\.\d+)?", s):
-        return False
-    return True
-
-
 def parse_query_ner_models(models_arg: str):
     if not models_arg or not models_arg.strip():
         return ["en_core_sci_md", "en_ner_bc5cdr_md", "en_ner_jnlpba_md"]
@@ -71,51 +111,136 @@ def parse_query_ner_models(models_arg: str):
 
 
 def merge_mentions_union(*mentions_maps):
-    merged = defaultdict(list)
-    seen = defaultdict(set)
+    merged = {}
+    seen = {}
     for mm in mentions_maps:
         for qid, mentions in mm.items():
+            seen_q = seen.setdefault(qid, set())
             for m in mentions:
-                if not valid_mention(m):
-                    continue
+                # Drop short or purely numeric mentions and repeats (by normalized key).
                 key = normalize_mention(m)
-                if key in seen[qid]:
+                if len(key) < 3 or key in seen_q or _NUM_RE.fullmatch(key):
                     continue
-                seen[qid].add(key)
-                merged[qid].append(m)
-    return dict(merged)
+                seen_q.add(key)
+                merged.setdefault(qid, []).append(m)
+    return merged
+
+
+# Exit 2: spaCy itself is unusable; exit 3: the model named on stdout failed.
+_VALIDATE_NER_SCRIPT = """\
+import sys, traceback
+try:
+    import spacy
+except Exception:
+    traceback.print_exc()
+    sys.exit(2)
+for model in sys.argv[1:]:
+    try:
+        spacy.load(model)
+    except Exception:
+        print(model)
+        traceback.print_exc()
+        sys.exit(3)
+print("ok")
+"""
 
 
 def validate_ner_runtime(ner_python: str, models: list):
-    base_cmd = [
-        ner_python,
-        "-c",
-        "import sys, spacy; print(sys.executable)",
-    ]
+    """Checks spaCy and every model in ``models`` in one ``ner_python`` process."""
+    cmd = [ner_python, "-c", _VALIDATE_NER_SCRIPT, *models]
+    runtime_error = (
+        f"NER runtime check failed for '{ner_python}'. "
+        "Ensure this Python has spaCy installed."
+    )
     try:
-        subprocess.run(base_cmd, check=True, capture_output=True, text=True)
-    except Exception as exc:
-        raise RuntimeError(
-            f"NER runtime check failed for '{ner_python}'. "
-            "Ensure this Python has spaCy installed."
-        ) from exc
-
-    for model in models:
-        load_cmd = [
-            ner_python,
-            "-c",
-            f"import spacy; spacy.load({model!r}); print('ok {model}')",
-        ]
-        try:
-            subprocess.run(load_cmd, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as exc:
-            stderr = (exc.stderr or "").strip()
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as exc:
+        if exc.returncode == 3:
             stdout = (exc.stdout or "").strip()
-            detail = stderr or stdout or str(exc)
+            model = stdout.splitlines()[0] if stdout else "?"
+            detail = (exc.stderr or "").strip() or str(exc)
             raise RuntimeError(
                 f"Failed to load spaCy model '{model}' via '{ner_python}'. "
                 f"Install it in that environment. Detail: {detail}"
             ) from exc
+        raise RuntimeError(runtime_error) from exc
+    except OSError as exc:
+        raise RuntimeError(runtime_error) from exc
+
+
+# -----------------------------
+# NER worker (external env)
+# -----------------------------
+PASSAGE_NER_MODEL = "en_ner_bc5cdr_md"
+
+
+class NERWorker:
+    """
+    One long-lived `run_ner_offline.py --serve` process in the NER environment.
+
+    Interpreter start-up and spaCy model loads happen once per run instead of
+    once per query; every request is a batch that the worker runs through
+    nlp.pipe for each requested model. The process is only started by the
+    first request, and a request that gets no reply within ``timeout`` seconds
+    kills it.
+    """
+
+    def __init__(self, ner_python: str, timeout: float = 600):
+        self.cmd = [ner_python, "scripts/run_ner_offline.py", "--serve"]
+        self.timeout = timeout
+        self.proc = None
+        self.replies = None
+
+    def _start(self):
+        print(f"[INFO] NER worker CMD: {' '.join(self.cmd)}", flush=True)
+        self.proc = subprocess.Popen(
+            self.cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        # A reader thread feeds replies through a queue so annotate() can wait
+        # with a deadline; select() does not work on pipes on Windows.
+        self.replies = queue.Queue()
+        threading.Thread(target=self._read_replies, daemon=True).start()
+
+    def _read_replies(self):
+        for line in self.proc.stdout:
+            self.replies.put(line)
+        self.replies.put(b"")
+
+    def annotate(self, models: list, docs: list) -> dict:
+        """Returns {model: [{id, text, ents}]} for ``docs`` (dicts with id/text)."""
+        if self.proc is None:
+            self._start()
+        self.proc.stdin.write(dumps_json_line({"models": list(models), "docs": docs}))
+        self.proc.stdin.flush()
+        try:
+            line = self.replies.get(timeout=self.timeout)
+        except queue.Empty:
+            self.proc.kill()
+            raise RuntimeError(
+                f"NER worker gave no reply within {self.timeout}s: {' '.join(self.cmd)}"
+            ) from None
+        if not line:
+            raise RuntimeError(
+                f"NER worker exited (code {self.proc.poll()}): {' '.join(self.cmd)}"
+            )
+        return loads_json(line)
+
+    def close(self, kill: bool = False):
+        if self.proc is None:
+            return
+        if kill:
+            self.proc.kill()
+        elif self.proc.stdin and not self.proc.stdin.closed:
+            self.proc.stdin.close()
+        self.proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(kill=exc_type is not None)
 
 
 # -----------------------------
@@ -123,9 +248,9 @@ def validate_ner_runtime(ner_python: str, models: list):
 # -----------------------------
 def run_passage_ner(
     corpus_path: str,
-    doc_ids: list,
+    doc_ids,
     out_path: Path,
-    ner_python: str,
+    ner_worker: NERWorker,
 ):
     """
     Run spaCy BC5CDR NER ONLY on retrieved passages.
@@ -135,27 +260,17 @@ def run_passage_ner(
         text,
         ents: [{text, label, start, end}]
       }
+    ``doc_ids`` may be any iterable; it is turned into a set once so the
+    single corpus scan does O(1) membership tests per row.
     """
-    tmp_subset = out_path.parent / "tmp_passages.jsonl"
-
-    with open(tmp_subset, "w", encoding="utf-8") as out:
-        for row in load_jsonl(corpus_path):
-            if row.get("id") in doc_ids:
-                out.write(json.dumps(row) + "\n")
-
-    cmd = [
-        ner_python,
-        "scripts/run_ner_offline.py",
-        "--input",
-        str(tmp_subset),
-        "--output",
-        str(out_path),
-    ]
+    docs = list(iter_corpus_rows(corpus_path, doc_ids))
 
     print(f"[INFO] Passage NER START qid={out_path.stem} out={out_path}", flush=True)
-    print(f"[INFO] Passage NER CMD: {' '.join(cmd)}", flush=True)
-    subprocess.run(cmd, check=True, timeout=600)
+    rows = ner_worker.annotate([PASSAGE_NER_MODEL], docs)[PASSAGE_NER_MODEL]
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    write_jsonl(out_path, rows)
     print(f"[INFO] Passage NER END qid={out_path.stem} out={out_path}", flush=True)
+    return rows
 
 
 # -----------------------------
@@ -173,52 +288,35 @@ def sanitize_model_tag(model: str) -> str:
 def run_query_ner(
     queries: list,
     out_dir: Path,
-    ner_python: str,
-    model: str,
+    ner_worker: NERWorker,
+    models: list,
 ):
     """
     Run spaCy NER over query texts to extract head candidates.
-    Returns: (mentions_by_qid, output_path)
+    All models see the same batch in a single worker request.
+    Returns: {model: (mentions_by_qid, output_path)}
     """
     out_dir.mkdir(parents=True, exist_ok=True)
-    model_tag = sanitize_model_tag(model)
-    tmp_input = out_dir / f"query_ner.{model_tag}.input.jsonl"
-    tmp_output = out_dir / f"query_ner.{model_tag}.output.jsonl"
-
-    with open(tmp_input, "w", encoding="utf-8") as out:
-        for q in queries:
-            out.write(
-                json.dumps(
-                    {
-                        "id": q["qid"],
-                        "text": q["text"],
-                    }
-                )
-                + "\n"
-            )
+    docs = [{"id": q["qid"], "text": q["text"]} for q in queries]
 
-    cmd = [
-        ner_python,
-        "scripts/run_ner_offline.py",
-        "--input",
-        str(tmp_input),
-        "--output",
-        str(tmp_output),
-        "--model",
-        model,
-    ]
+    print(f"[INFO] Running query-level NER (models={','.join(models)})...")
+    results = ner_worker.annotate(models, docs)
 
-    print(f"[INFO] Running query-level NER (model={model})...")
-    subprocess.run(cmd, check=True)
+    out = {}
+    for model in models:
+        rows = results[model]
+        tmp_output = out_dir / f"query_ner.{sanitize_model_tag(model)}.output.jsonl"
+        write_jsonl(tmp_output, rows)
 
-    mentions_by_qid = {}
-    for row in load_jsonl(tmp_output):
-        qid = row.get("id") or row.get("doc_id")
-        ents = row.get("ents", [])
-        mentions = [e.get("text") for e in ents if e.get("text")]
-        mentions_by_qid[qid] = mentions
+        mentions_by_qid = {}
+        for row in rows:
+            qid = row.get("id") or row.get("doc_id")
+            ents = row.get("ents", [])
+            mentions = [e.get("text") for e in ents if e.get("text")]
+            mentions_by_qid[qid] = mentions
+        out[model] = (mentions_by_qid, tmp_output)
 
-    return mentions_by_qid, tmp_output
+    return out
 
 
 def pick_best_head_candidate(linked_groups: list, min_score: float):
@@ -239,7 +337,9 @@ def pick_best_head_candidate(linked_groups: list, min_score: float):
     return None
 
 
-def get_installed_spacy_models(ner_python: str) -> list:
+@lru_cache(maxsize=8)
+def get_installed_spacy_models(ner_python: str) -> tuple:
+    """Installed spaCy packages for ``ner_python``; the subprocess runs once per interpreter."""
     cmd = [
         ner_python,
         "-c",
@@ -247,10 +347,10 @@ def get_installed_spacy_models(ner_python: str) -> list:
     ]
     try:
         res = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        return json.loads(res.stdout.strip() or "[]")
+        return tuple(json.loads(res.stdout.strip() or "[]"))
     except Exception as exc:
         print(f"[WARN] Could not list spaCy models via {ner_python}: {exc}")
-        return []
+        return ()
 
 
 def resolve_query_ner_model(requested: str, ner_python: str) -> str:
@@ -279,7 +379,7 @@ def resolve_query_ner_model(requested: str, ner_python: str) -> str:
 
     if installed:
         print(
-            f"[WARN] Query NER model '{requested}' not found; installed models: {installed}"
+            f"[WARN] Query NER model '{requested}' not found; installed models: {list(installed)}"
         )
 
     return requested
@@ -329,82 +429,125 @@ def main():
         default=0.65,
         help="Minimum SapBERT score to accept a head candidate",
     )
+    ap.add_argument(
+        "--query_workers",
+        type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="Threads for per-query claims/validation; EL linking is serialized "
+        "behind a lock (1 = sequential)",
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="Append to --out, skipping qids it already contains",
+    )
     ap.add_argument(
         "--ner_python",
         default=sys.executable,
         help="Python executable of NER environment (default: current)",
     )
+    ap.add_argument(
+        "--ner_timeout",
+        type=float,
+        default=600,
+        help="Seconds to wait for each NER worker reply before killing it",
+    )
     args = ap.parse_args()
+    # The worker is only spawned if query or passage NER actually runs.
+    with NERWorker(args.ner_python, timeout=args.ner_timeout) as ner_worker:
+        analyze(args, ner_worker)
+
+
+def analyze(args, ner_worker: NERWorker):
     print(f"[INFO] Analyzer python: {sys.executable}")
     print(f"[INFO] NER subprocess python: {args.ner_python}")
     validate_ner_runtime(args.ner_python, [])
 
     print("[INFO] Loading queries...")
     queries = list(load_jsonl(args.queries))
-
-    print("[INFO] Initializing retriever...")
-    retriever = TextRetriever(args.corpus)
-
-    print("[INFO] Initializing EL + relation classifier...")
-    el = ELAdapter()
-    rel_clf = RelationClassifier()
-
-    print("[INFO] Loading KG once...")
-    kg = KGLoader(args.kg)
-    validator = KGValidator(kg, args.kg_version)
-    kg_predicates = {r.upper() for _, r, _ in getattr(kg, "edge_set", set())}
-
-    outputs = []
-    head_debug_rows = []
-    skip_reason_counts = Counter()
+    if args.resume and Path(args.out).exists():
+        done = completed_qids(args.out)
+        queries = [q for q in queries if q["qid"] not in done]
+        print(f"[INFO] Resuming: {len(done)} done, {len(queries)} remaining")
+        if not queries:
+            print(f"[SUCCESS] Nothing to do -> {args.out}")
+            return
 
     missing_head_queries = [q for q in queries if not q.get("head_cui")]
     mentions_by_qid = {}
     mentions_by_model = {}
     query_ner_models = []
-    query_ner_path = None
     query_ner_mode = args.query_ner_mode
     query_mode = args.query_mode
     query_ner_run_id = args.query_ner_run_id or datetime.utcnow().strftime(
         "%Y%m%d_%H%M%S"
     )
     resolved_query_ner_model = args.query_ner_model
+    head_debug_path = (
+        Path(".tmp") / f"query_head_grounding.{query_ner_mode}.{query_ner_run_id}.jsonl"
+    )
+    query_ner_job = None
     if missing_head_queries:
         if query_ner_mode == "ensemble3":
             query_ner_models = parse_query_ner_models(args.query_ner_models)
             validate_ner_runtime(args.ner_python, query_ner_models)
-            output_paths = []
-            per_model_maps = []
-            for model_name in query_ner_models:
-                mm, out_path = run_query_ner(
-                    queries=missing_head_queries,
-                    out_dir=Path(".tmp"),
-                    ner_python=args.ner_python,
-                    model=model_name,
-                )
-                mentions_by_model[model_name] = mm
-                per_model_maps.append(mm)
-                output_paths.append(str(out_path))
-            mentions_by_qid = merge_mentions_union(*per_model_maps)
             resolved_query_ner_model = ",".join(query_ner_models)
-            query_ner_path = ",".join(output_paths)
         else:
             resolved_query_ner_model = resolve_query_ner_model(
                 args.query_ner_model,
                 args.ner_python,
             )
             validate_ner_runtime(args.ner_python, [resolved_query_ner_model])
-            mentions_by_qid, query_ner_path = run_query_ner(
-                queries=missing_head_queries,
-                out_dir=Path(".tmp"),
-                ner_python=args.ner_python,
-                model=resolved_query_ner_model,
-            )
             query_ner_models = [resolved_query_ner_model]
-            mentions_by_model[resolved_query_ner_model] = mentions_by_qid
+        # The NER worker loads its models and tags the queries while the
+        # retriever, EL models and KG load below; this thread only waits on it.
+        query_ner_pool = ThreadPoolExecutor(max_workers=1)
+        query_ner_job = query_ner_pool.submit(
+            run_query_ner,
+            queries=missing_head_queries,
+            out_dir=Path(".tmp"),
+            ner_worker=ner_worker,
+            models=query_ner_models,
+        )
+        query_ner_pool.shutdown(wait=False)
+
+    print("[INFO] Initializing retriever...")
+    retriever = TextRetriever(args.corpus)
+
+    print("[INFO] Initializing EL + relation classifier...")
+    el = ELAdapter()
+    rel_clf = RelationClassifier()
+    # Benchmarks repeat templated questions: predict each distinct text once.
+    # Keys are the exact question text, since the classifier sees case.
+    predict_relation = lru_cache(maxsize=8192)(rel_clf.predict)
+    infer_question_predicate = lru_cache(maxsize=8192)(infer_predicate)
+
+    print("[INFO] Loading KG once...")
+    kg = KGLoader(args.kg)
+    validator = KGValidator(kg, args.kg_version)
+    kg_predicates = frozenset(kg.predicates)
+
+    head_debug_fh = None  # opened on the first head-grounding row
+    skip_reason_counts = Counter()
+
+    if query_ner_job is not None:
+        per_model = query_ner_job.result()
+        for model_name, (mm, _) in per_model.items():
+            mentions_by_model[model_name] = mm
+        if query_ner_mode == "ensemble3":
+            mentions_by_qid = merge_mentions_union(
+                *(mm for mm, _ in per_model.values())
+            )
+        else:
+            mentions_by_qid = mentions_by_model[resolved_query_ner_model]
+        query_ner_path = ",".join(str(path) for _, path in per_model.values())
         print(f"[INFO] Query-level NER output: {query_ner_path}")
         print(f"[INFO] Query-level NER models: {query_ner_models}")
 
+    # Pass 1: relation + head grounding per query. Retrieval for the queries
+    # that need passages follows, so passage NER can run once over the union.
+    contexts = []
+    passage_doc_ids = set()
     for q in queries:
         qid = q["qid"]
         question = q["text"]
@@ -428,14 +571,14 @@ def main():
             if relation:
                 relation = str(relation).strip().upper()
             if not relation:
-                relation = infer_predicate(question)
+                relation = infer_question_predicate(question)
             if not relation:
-                relation = rel_clf.predict(question)
+                relation = predict_relation(question)
         else:
-            relation = rel_clf.predict(question)
+            relation = predict_relation(question)
         if not relation:
             relation = "ASSOCIATED_WITH"
-        relation = str(relation).strip().upper()
+        relation = sys.intern(str(relation).strip().upper())
         relation_in_kg = relation in kg_predicates
 
         # -------------------------
@@ -470,43 +613,158 @@ def main():
             else:
                 ungrounded_head = True
 
-            head_debug_rows.append(
-                {
+            head_row = {
+                "qid": qid,
+                "text": question,
+                "mentions": query_mentions,
+                "mentions_by_model": mentions_for_qid_by_model,
+                "query_ner_models": query_ner_models,
+                "head_cui": head_cui,
+                "head_text": head_text,
+                "head_score": head_score,
+                "head_entity_type": (best or {}).get("entity_type"),
+                "head_entity_type_missing": bool(best)
+                and not (best or {}).get("entity_type"),
+                "missing_entity_type_count": missing_entity_type_count,
+                "head_source": head_source,
+                "query_ner_model": resolved_query_ner_model,
+                "query_ner_mode": query_ner_mode,
+                "query_ner_run_id": query_ner_run_id,
+                "ner_python": args.ner_python,
+                "head_min_score": args.head_min_score,
+                "ungrounded_head": ungrounded_head,
+            }
+            if head_debug_fh is None:
+                head_debug_path.parent.mkdir(parents=True, exist_ok=True)
+                head_debug_fh = open(head_debug_path, "wb", buffering=1 << 20)
+            head_debug_fh.write(dumps_json_line(head_row))
+
+        ctx = {
+            "qid": qid,
+            "question": question,
+            "relation": relation,
+            "relation_in_kg": relation_in_kg,
+            "head_cui": head_cui,
+            "head_text": head_text,
+            "head_score": head_score,
+            "head_source": head_source,
+            "ungrounded_head": ungrounded_head,
+            "query_mentions": query_mentions,
+            "mentions_for_qid_by_model": mentions_for_qid_by_model,
+        }
+        contexts.append(ctx)
+
+    # -------------------------
+    # 1) Retrieval, one batch for every grounded free-mode query
+    # -------------------------
+    to_retrieve = [
+        ctx
+        for ctx in contexts
+        if not ctx["ungrounded_head"] and query_mode != "kg_aligned"
+    ]
+    retrieved_all = retriever.retrieve_batch(
+        [ctx["question"] for ctx in to_retrieve], topk=args.retrieval_topk
+    )
+    for ctx, retrieved in zip(to_retrieve, retrieved_all):
+        ctx["doc_ids"] = [doc_id for doc_id, _ in retrieved]
+        # Passages are only used when the relation can be validated.
+        if ctx["relation_in_kg"]:
+            passage_doc_ids.update(ctx["doc_ids"])
+
+    # -------------------------
+    # 2) Passage-level NER, once for all queries
+    # -------------------------
+    passage_rows = []
+    passage_pos = defaultdict(list)
+    if passage_doc_ids:
+        passage_rows = run_passage_ner(
+            corpus_path=args.corpus,
+            doc_ids=passage_doc_ids,
+            out_path=Path(".tmp") / "passage_ner.all.jsonl",
+            ner_worker=ner_worker,
+        )
+        for i, row in enumerate(passage_rows):
+            passage_pos[row.get("id")].append(i)
+        print("[DEBUG] finished passage-level NER loop", flush=True)
+
+    # Pass 2: claims, validation and output rows. Queries are independent and
+    # the EL encoder / FAISS search release the GIL, so they run on threads.
+    # The EL linkers share one HF fast tokenizer and model, and fast tokenizers
+    # are not thread-safe ("Already borrowed"), so linking is serialized while
+    # claim building and KG validation run concurrently.
+    el_lock = threading.Lock()
+
+    def finish_query(ctx):
+        qid = ctx["qid"]
+        question = ctx["question"]
+        relation = ctx["relation"]
+        relation_in_kg = ctx["relation_in_kg"]
+        head_cui = ctx["head_cui"]
+        head_text = ctx["head_text"]
+        head_score = ctx["head_score"]
+        head_source = ctx["head_source"]
+        ungrounded_head = ctx["ungrounded_head"]
+        query_mentions = ctx["query_mentions"]
+        mentions_for_qid_by_model = ctx["mentions_for_qid_by_model"]
+
+        if ungrounded_head:
+            return {
+                "qid": qid,
+                "text": question,
+                "retrieved_docs": [],
+                "predicted_relation": relation,
+                "relation_in_kg": relation_in_kg,
+                "head_cui": head_cui,
+                "head_text": head_text,
+                "head_score": head_score,
+                "head_source": head_source,
+                "ungrounded_head": True,
+                "mentions": query_mentions,
+                "mentions_by_model": mentions_for_qid_by_model,
+                "query_ner_models": query_ner_models,
+                "ner_python": args.ner_python,
+                "claims": [],
+                "kg_validation": [],
+                "kg_validation_summary": {},
+            }
+
+        if query_mode == "kg_aligned":
+            if not relation_in_kg:
+                return {
                     "qid": qid,
                     "text": question,
-                    "mentions": query_mentions,
-                    "mentions_by_model": mentions_for_qid_by_model,
-                    "query_ner_models": query_ner_models,
+                    "retrieved_docs": [],
+                    "predicted_relation": relation,
+                    "relation_in_kg": False,
+                    "skipped_reason": "relation_not_in_kg",
                     "head_cui": head_cui,
                     "head_text": head_text,
                     "head_score": head_score,
-                    "head_entity_type": (best or {}).get("entity_type"),
-                    "head_entity_type_missing": bool(best)
-                    and not (best or {}).get("entity_type"),
-                    "missing_entity_type_count": missing_entity_type_count,
                     "head_source": head_source,
-                    "query_ner_model": resolved_query_ner_model,
-                    "query_ner_mode": query_ner_mode,
-                    "query_ner_run_id": query_ner_run_id,
+                    "ungrounded_head": False,
+                    "mentions": query_mentions,
+                    "mentions_by_model": mentions_for_qid_by_model,
+                    "query_ner_models": query_ner_models,
                     "ner_python": args.ner_python,
-                    "head_min_score": args.head_min_score,
-                    "ungrounded_head": ungrounded_head,
+                    "claims": [],
+                    "kg_validation": [],
+                    "kg_validation_summary": {},
                 }
-            )
 
-        if ungrounded_head:
-            outputs.append(
-                {
+            tails = kg.tails(head_cui, relation)
+            if not tails:
+                return {
                     "qid": qid,
                     "text": question,
                     "retrieved_docs": [],
                     "predicted_relation": relation,
-                    "relation_in_kg": relation_in_kg,
+                    "relation_in_kg": True,
+                    "skipped_reason": "no_kg_neighbors",
                     "head_cui": head_cui,
                     "head_text": head_text,
                     "head_score": head_score,
                     "head_source": head_source,
-                    "ungrounded_head": True,
+                    "ungrounded_head": False,
                     "mentions": query_mentions,
                     "mentions_by_model": mentions_for_qid_by_model,
                     "query_ner_models": query_ner_models,
@@ -515,62 +773,6 @@ def main():
                     "kg_validation": [],
                     "kg_validation_summary": {},
                 }
-            )
-            continue
-
-        if query_mode == "kg_aligned":
-            if not relation_in_kg:
-                skip_reason_counts["relation_not_in_kg"] += 1
-                outputs.append(
-                    {
-                        "qid": qid,
-                        "text": question,
-                        "retrieved_docs": [],
-                        "predicted_relation": relation,
-                        "relation_in_kg": False,
-                        "skipped_reason": "relation_not_in_kg",
-                        "head_cui": head_cui,
-                        "head_text": head_text,
-                        "head_score": head_score,
-                        "head_source": head_source,
-                        "ungrounded_head": False,
-                        "mentions": query_mentions,
-                        "mentions_by_model": mentions_for_qid_by_model,
-                        "query_ner_models": query_ner_models,
-                        "ner_python": args.ner_python,
-                        "claims": [],
-                        "kg_validation": [],
-                        "kg_validation_summary": {},
-                    }
-                )
-                continue
-
-            tails = kg.tails(head_cui, relation)
-            if not tails:
-                skip_reason_counts["no_kg_neighbors"] += 1
-                outputs.append(
-                    {
-                        "qid": qid,
-                        "text": question,
-                        "retrieved_docs": [],
-                        "predicted_relation": relation,
-                        "relation_in_kg": True,
-                        "skipped_reason": "no_kg_neighbors",
-                        "head_cui": head_cui,
-                        "head_text": head_text,
-                        "head_score": head_score,
-                        "head_source": head_source,
-                        "ungrounded_head": False,
-                        "mentions": query_mentions,
-                        "mentions_by_model": mentions_for_qid_by_model,
-                        "query_ner_models": query_ner_models,
-                        "ner_python": args.ner_python,
-                        "claims": [],
-                        "kg_validation": [],
-                        "kg_validation_summary": {},
-                    }
-                )
-                continue
 
             claims = []
             for tail in tails:
@@ -599,69 +801,81 @@ def main():
                 validations.append(res)
                 summary[res["verdict"].value] += 1
 
-            outputs.append(
-                {
-                    "qid": qid,
-                    "text": question,
-                    "retrieved_docs": [],
-                    "predicted_relation": relation,
-                    "relation_in_kg": True,
-                    "head_cui": head_cui,
-                    "head_text": head_text,
-                    "head_score": head_score,
-                    "head_source": head_source,
-                    "ungrounded_head": False,
-                    "mentions": query_mentions,
-                    "mentions_by_model": mentions_for_qid_by_model,
-                    "query_ner_models": query_ner_models,
-                    "ner_python": args.ner_python,
-                    "claims": claims,
-                    "kg_validation": validations,
-                    "kg_validation_summary": dict(summary),
-                }
-            )
-            continue
+            return {
+                "qid": qid,
+                "text": question,
+                "retrieved_docs": [],
+                "predicted_relation": relation,
+                "relation_in_kg": True,
+                "head_cui": head_cui,
+                "head_text": head_text,
+                "head_score": head_score,
+                "head_source": head_source,
+                "ungrounded_head": False,
+                "mentions": query_mentions,
+                "mentions_by_model": mentions_for_qid_by_model,
+                "query_ner_models": query_ner_models,
+                "ner_python": args.ner_python,
+                "claims": claims,
+                "kg_validation": validations,
+                "kg_validation_summary": dict(summary),
+            }
 
-        # -------------------------
-        # 1) Retrieval
-        # -------------------------
-        retrieved = retriever.retrieve(question, topk=args.retrieval_topk)
-        doc_ids = [doc_id for doc_id, _ in retrieved]
+        doc_ids = ctx["doc_ids"]
 
-        # -------------------------
-        # 2) Passage-level NER
-        # -------------------------
-        passage_ner_path = Path(".tmp") / f"{qid}.passage_ner.jsonl"
-        run_passage_ner(
-            corpus_path=args.corpus,
-            doc_ids=doc_ids,
-            out_path=passage_ner_path,
-            ner_python=args.ner_python,
-        )
-        print("[DEBUG] finished passage-level NER loop", flush=True)
+        if not relation_in_kg:
+            return {
+                "qid": qid,
+                "text": question,
+                "retrieved_docs": doc_ids,
+                "predicted_relation": relation,
+                "relation_in_kg": False,
+                "skipped_reason": "relation_not_in_kg",
+                "head_cui": head_cui,
+                "head_text": head_text,
+                "head_score": head_score,
+                "head_source": head_source,
+                "ungrounded_head": False,
+                "mentions": query_mentions,
+                "mentions_by_model": mentions_for_qid_by_model,
+                "query_ner_models": query_ner_models,
+                "ner_python": args.ner_python,
+                "claims": [],
+                "kg_validation": [],
+                "kg_validation_summary": {},
+            }
 
         # -------------------------
         # 4) Build passage objects
         # -------------------------
         passages = []
 
-        for row in load_jsonl(passage_ner_path):
-            tail_mentions = [e["text"] for e in row.get("ents", [])]
-            if not tail_mentions:
-                continue
+        # Same rows, in corpus order, that a per-query NER pass produced.
+        rows = [
+            passage_rows[i]
+            for i in sorted({i for d in doc_ids for i in passage_pos.get(d, ())})
+        ]
 
-            linked_groups = el.link_mentions(
-                question=question,
-                mentions=tail_mentions,
-                relation=relation,
-                slot="tail",
-            )
+        # Link every tail mention of every passage in one batch, then scatter
+        # the results back via (passage index, mention) pairs.
+        flat = [(pi, e["text"]) for pi, row in enumerate(rows) for e in row.get("ents", [])]
+        linked_flat = []
+        if flat:
+            with el_lock:
+                linked_flat = el.link_mentions_batch(
+                    question=question,
+                    mentions=[m for _, m in flat],
+                    relation=relation,
+                    slot="tail",
+                )
 
-            linked = []
-            for cands in linked_groups:
-                if cands:
-                    linked.append(cands[0])  # best candidate only
+        linked_by_passage = defaultdict(list)
+        for (pi, _), cands in zip(flat, linked_flat):
+            if cands:
+                linked_by_passage[pi].append(cands[0])  # best candidate only
 
+        for pi, row in enumerate(rows):
+            linked = linked_by_passage.get(pi)
             if not linked:
                 continue
 
@@ -672,32 +886,6 @@ def main():
                 }
             )
 
-        if not relation_in_kg:
-            skip_reason_counts["relation_not_in_kg"] += 1
-            outputs.append(
-                {
-                    "qid": qid,
-                    "text": question,
-                    "retrieved_docs": doc_ids,
-                    "predicted_relation": relation,
-                    "relation_in_kg": False,
-                    "skipped_reason": "relation_not_in_kg",
-                    "head_cui": head_cui,
-                    "head_text": head_text,
-                    "head_score": head_score,
-                    "head_source": head_source,
-                    "ungrounded_head": False,
-                    "mentions": query_mentions,
-                    "mentions_by_model": mentions_for_qid_by_model,
-                    "query_ner_models": query_ner_models,
-                    "ner_python": args.ner_python,
-                    "claims": [],
-                    "kg_validation": [],
-                    "kg_validation_summary": {},
-                }
-            )
-            continue
-
         # -------------------------
         # 5) Claim construction
         # -------------------------
@@ -723,37 +911,45 @@ def main():
             validations.append(res)
             summary[res["verdict"].value] += 1
 
-        outputs.append(
-            {
-                "qid": qid,
-                "text": question,
-                "retrieved_docs": doc_ids,
-                "predicted_relation": relation,
-                "relation_in_kg": True,
-                "head_cui": head_cui,
-                "head_text": head_text,
-                "head_score": head_score,
-                "head_source": head_source,
-                "ungrounded_head": False,
-                "mentions": query_mentions,
-                "mentions_by_model": mentions_for_qid_by_model,
-                "query_ner_models": query_ner_models,
-                "ner_python": args.ner_python,
-                "claims": claims,
-                "kg_validation": validations,
-                "kg_validation_summary": dict(summary),
-            }
-        )
+        return {
+            "qid": qid,
+            "text": question,
+            "retrieved_docs": doc_ids,
+            "predicted_relation": relation,
+            "relation_in_kg": True,
+            "head_cui": head_cui,
+            "head_text": head_text,
+            "head_score": head_score,
+            "head_source": head_source,
+            "ungrounded_head": False,
+            "mentions": query_mentions,
+            "mentions_by_model": mentions_for_qid_by_model,
+            "query_ner_models": query_ner_models,
+            "ner_python": args.ner_python,
+            "claims": claims,
+            "kg_validation": validations,
+            "kg_validation_summary": dict(summary),
+        }
 
-    print(f"[DEBUG] about to write outputs n={len(outputs)} to {args.out}", flush=True)
-    write_jsonl(args.out, outputs)
-    if head_debug_rows:
-        head_debug_path = (
-            Path(".tmp")
-            / f"query_head_grounding.{query_ner_mode}.{query_ner_run_id}.jsonl"
-        )
-        write_jsonl(head_debug_path, head_debug_rows)
+    # Frees the spaCy models before the output pass; __exit__ is then a no-op.
+    ner_worker.close()
+    if head_debug_fh is not None:
+        head_debug_fh.close()
         print(f"[INFO] Head grounding log: {head_debug_path}")
+
+    # Rows are written and flushed as they finish (in query order), so a crashed
+    # run keeps its finished queries and --resume picks up after them.
+    print(f"[DEBUG] writing outputs n={len(contexts)} to {args.out}", flush=True)
+    out_mode = "ab" if args.resume else "wb"
+    with ThreadPoolExecutor(max_workers=max(1, args.query_workers)) as ex, open(
+        args.out, out_mode
+    ) as out_fh:
+        for row in ex.map(finish_query, contexts):
+            if "skipped_reason" in row:
+                skip_reason_counts[row["skipped_reason"]] += 1
+            out_fh.write(dumps_json_line(row))
+            out_fh.flush()
+
     if skip_reason_counts:
         print(f"[INFO] Skip summary: {dict(skip_reason_counts)}")
     print(f"[SUCCESS] Wrote output -> {args.out}")
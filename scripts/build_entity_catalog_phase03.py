@@ -1,11 +1,30 @@
 import csv
-import json
 import os
 import re
-import xml.etree.ElementTree as ET
+import sys
 from collections import defaultdict, Counter
 import string as py_string
 
+try:
+    from lxml import etree as xml_etree
+
+    _ITERPARSE_KWARGS = {"huge_tree": True}
+except ImportError:
+    import xml.etree.ElementTree as xml_etree
+
+    _ITERPARSE_KWARGS = {}
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+    pc = None
+    pacsv = None
+
+from jsonl_io import dumps_json_line
+
 # ===============================
 # Paths
 # ===============================
@@ -22,22 +41,22 @@ OUTPUT_JSONL = "data/processed/entities/entity_catalog.cleaned.jsonl"
 # ===============================
 # Normalization & Surface Expansion
 # ===============================
+_WS_RE = re.compile(r"\s+")
+_PUNCT_TABLE = str.maketrans("", "", py_string.punctuation)
+
+
 def normalize(text: str) -> str:
     """Lowercase and collapse whitespace."""
-    return re.sub(r"\s+", " ", text.lower().strip())
+    return " ".join(text.lower().split())
 
 
 def remove_punct(text: str) -> str:
-    return text.translate(str.maketrans("", "", py_string.punctuation))
+    return text.translate(_PUNCT_TABLE)
 
 
 def hyphen_space_variants(text: str) -> set:
-    variants = set()
-    base = text.replace("-", " ")
-    base = re.sub(r"\s+", " ", base)
-    variants.add(base)
-    variants.add(base.replace(" ", "-"))
-    return variants
+    base = _WS_RE.sub(" ", text.replace("-", " "))
+    return {base, base.replace(" ", "-")}
 
 
 def disease_word_order_variants(text: str) -> set:
@@ -51,26 +70,90 @@ def disease_word_order_variants(text: str) -> set:
 def expand_surfaces(text: str, entity_type: str = None) -> set:
     """Deterministic surface expansion."""
     norm = normalize(text)
-    surfaces = set()
-
-    surfaces.add(norm)
-
-    no_punct = remove_punct(norm)
-    surfaces.add(no_punct)
+    surfaces = {norm, remove_punct(norm)}
 
     for v in list(surfaces):
-        surfaces.update(hyphen_space_variants(v))
+        # Without '-' or ' ' both variants equal v itself.
+        if "-" in v or " " in v:
+            surfaces.update(hyphen_space_variants(v))
 
     if entity_type == "disease":
         for v in list(surfaces):
             surfaces.update(disease_word_order_variants(v))
 
-    return {s.strip() for s in surfaces if s.strip()}
+    # Interned: the same surfaces recur across millions of source terms.
+    return {sys.intern(s) for s in map(str.strip, surfaces) if s}
+
+
+def iter_root_children(path: str, tag: str):
+    """Streams direct children of the XML root named ``tag``, releasing each after use."""
+    root = None
+    depth = 0
+    for event, elem in xml_etree.iterparse(path, events=("start", "end"), **_ITERPARSE_KWARGS):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            if elem.tag == tag:
+                yield elem
+            root.clear()
+
+
+RXN_TTYS = ("IN", "BN", "PIN")
+
+
+def iter_rxnorm_names(path: str):
+    """Yields STR of RXNORM-sourced IN/BN/PIN rows of RXNCONSO.RRF."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("|")
+            if len(fields) < 15:
+                continue
+            if fields[11] != "RXNORM" or fields[12] not in RXN_TTYS:
+                continue
+            yield fields[14]
+
+
+def iter_rxnorm_names_arrow(path: str):
+    """``iter_rxnorm_names`` via pyarrow's C++ CSV reader.
+
+    Only SAB, TTY and STR are materialized and the filter runs as Arrow compute
+    kernels, so Python only sees surviving rows. Malformed rows are skipped.
+    """
+    names = ["f11", "f12", "f14"]
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(autogenerate_column_names=True, block_size=64 << 20),
+        parse_options=pacsv.ParseOptions(
+            delimiter="|",
+            quote_char=False,
+            invalid_row_handler=lambda _row: "skip",
+        ),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=names,
+            column_types={name: pa.string() for name in names},
+            strings_can_be_null=False,
+        ),
+    )
+    ttys = pa.array(RXN_TTYS, type=pa.string())
+    for batch in reader:
+        mask = pc.and_(
+            pc.equal(batch.column("f11"), "RXNORM"),
+            pc.is_in(batch.column("f12"), value_set=ttys),
+        )
+        yield from pc.filter(batch.column("f14"), mask).to_pylist()
 
 
 # ===============================
 # Load canonical KG nodes
 # ===============================
+# Sources are accumulated as a bitmask and decoded to names when writing;
+# keys are in sorted order, so decoding yields the sorted source list.
+SRC_BITS = {"DrugBank": 1, "MeSH": 2, "RxNorm": 4}
+
 kg_nodes = {}
 with open(KG_NODES, newline="", encoding="utf-8") as f:
     for row in csv.DictReader(f):
@@ -78,8 +161,9 @@ with open(KG_NODES, newline="", encoding="utf-8") as f:
             "kg_id": row["kg_id"],
             "entity_type": row["entity_type"],
             "canonical_name": row["canonical_name"],
-            "synonyms": {row["canonical_name"]},
-            "sources": set(),
+            # Collected as a list/bitmask; deduplicated and decoded at write time.
+            "synonyms": [row["canonical_name"]],
+            "sources": 0,
         }
 
 # ===============================
@@ -105,30 +189,19 @@ for kg_id, node in kg_nodes.items():
 surface_candidates = defaultdict(lambda: defaultdict(set))
 
 # ---------- RxNorm ----------
-with open(RXNCONSO, encoding="utf-8") as f:
-    for line in f:
-        fields = line.rstrip("\n").split("|")
-        if len(fields) < 15:
-            continue
-
-        sab = fields[11]
-        tty = fields[12]
-        rxn_str = fields[14]
-
-        if sab != "RXNORM":
-            continue
-        if tty not in {"IN", "BN", "PIN"}:
-            continue
-
-        for surf in expand_surfaces(rxn_str):
-            surface_candidates[surf]["RxNorm"].add(rxn_str)
+rxn_names = (
+    iter_rxnorm_names_arrow(RXNCONSO) if pacsv is not None else iter_rxnorm_names(RXNCONSO)
+)
+# Each name recurs across many RXNCONSO rows; expand it once.
+for rxn_str in dict.fromkeys(rxn_names):
+    for surf in expand_surfaces(rxn_str):
+        surface_candidates[surf]["RxNorm"].add(rxn_str)
 
 # ---------- DrugBank ----------
-tree = ET.parse(DRUGBANK_XML)
-root = tree.getroot()
 ns = {"db": "http://www.drugbank.ca"}
 
-for drug in root.findall("db:drug", ns):
+# Top-level <drug> records only; pathway entries nest their own <drug> tags.
+for drug in iter_root_children(DRUGBANK_XML, "{http://www.drugbank.ca}drug"):
     names = set()
 
     main_name = drug.findtext("db:name", default="", namespaces=ns)
@@ -148,10 +221,7 @@ for drug in root.findall("db:drug", ns):
             surface_candidates[surf]["DrugBank"].add(name)
 
 # ---------- MeSH ----------
-tree = ET.parse(MESH_XML)
-root = tree.getroot()
-
-for desc in root.findall("DescriptorRecord"):
+for desc in iter_root_children(MESH_XML, "DescriptorRecord"):
     terms = set()
 
     dn = desc.findtext("DescriptorName/String", default="")
@@ -202,8 +272,8 @@ for surface, src_map in surface_candidates.items():
             if node["entity_type"] != "disease":
                 continue
 
-        node["synonyms"].update(names)
-        node["sources"].add(src)
+        node["synonyms"].extend(names)
+        node["sources"] |= SRC_BITS[src]
 
 # ===============================
 # Write entity catalog
@@ -211,22 +281,22 @@ for surface, src_map in surface_candidates.items():
 os.makedirs(os.path.dirname(OUTPUT_JSONL), exist_ok=True)
 
 syn_counts = []
-with open(OUTPUT_JSONL, "w", encoding="utf-8") as out:
+with open(OUTPUT_JSONL, "wb", buffering=1 << 20) as out:
     for node in kg_nodes.values():
         syns = sorted(set(node["synonyms"]))
         syn_counts.append(len(syns))
         out.write(
-            json.dumps(
+            dumps_json_line(
                 {
                     "kg_id": node["kg_id"],
                     "entity_type": node["entity_type"],
                     "canonical_name": node["canonical_name"],
                     "synonyms": syns,
-                    "sources": sorted(node["sources"]),
-                },
-                ensure_ascii=False,
+                    "sources": [
+                        name for name, bit in SRC_BITS.items() if node["sources"] & bit
+                    ],
+                }
             )
-            + "\n"
         )
 
 # ===============================
@@ -6,49 +6,58 @@ INPUT_CSV = "data/processed/kg_nodes.canonical.csv"
 OUTPUT_CSV = "data/processed/kg_drug_subtypes.csv"
 
 
+def _any_of(*words):
+    return "|".join(re.escape(w) for w in words)
+
+
+# One alternation per tier, so each name costs a handful of C-level scans
+# instead of a Python loop over every keyword.
+VACCINE_RE = re.compile(_any_of("vaccine", "toxoid"))
+BIOLOGIC_RE = re.compile(
+    r"mab\Z|"
+    + _any_of(
+        "antibody",
+        "cell therapy",
+        "gene therapy",
+        "interleukin",
+        "fusion protein",
+        "peg",
+        "recombinant",
+        "immunoglobulin",
+    )
+)
+ENZYME_RE = re.compile(
+    r"\b\w+ase\b|"
+    + _any_of(
+        "enzyme",
+        "protein",
+        "kinase",
+        "hormone",
+        "factor",
+        "peptide",
+        "interferon",
+        "insulin",
+        "growth factor",
+    )
+)
+CATEGORY_RE = re.compile(
+    _any_of("combination", "class", "group", "category", "agent", "preparation")
+)
+
+
 def classify_drug(canonical_name):
     name = canonical_name.lower()
     # 1. Vaccine
-    if "vaccine" in name or "toxoid" in name:
+    if VACCINE_RE.search(name):
         return "vaccine"
-    # 2. Biologic (suffix-based)
-    if name.endswith("mab") or name.endswith("zumab"):
-        return "biologic"
-    if any(
-        x in name
-        for x in [
-            "antibody",
-            "cell therapy",
-            "gene therapy",
-            "interleukin",
-            "fusion protein",
-            "peg",
-            "recombinant",
-            "immunoglobulin",
-        ]
-    ):
+    # 2. Biologic (-mab suffix or keyword)
+    if BIOLOGIC_RE.search(name):
         return "biologic"
-    # 3. Enzyme/protein (word-boundary regex for 'ase')
-    if re.search(r"\\b\\w+ase\\b", name) or any(
-        x in name
-        for x in [
-            "enzyme",
-            "protein",
-            "kinase",
-            "hormone",
-            "factor",
-            "peptide",
-            "interferon",
-            "insulin",
-            "growth factor",
-        ]
-    ):
+    # 3. Enzyme/protein ('ase' pattern or keyword)
+    if ENZYME_RE.search(name):
         return "enzyme/protein"
     # 4. Category/combination
-    if any(
-        x in name
-        for x in ["combination", "class", "group", "category", "agent", "preparation"]
-    ):
+    if CATEGORY_RE.search(name):
         return "category"
     # 5. Default: small molecule
     return "small_molecule"
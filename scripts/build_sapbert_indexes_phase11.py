@@ -10,7 +10,8 @@ Design choices (FROZEN):
 - SapBERT encoder (offline)
 - [CLS] embedding from last hidden layer
 - L2-normalized vectors
-- FAISS IndexFlatIP (exact cosine similarity)
+- FAISS IndexFlatIP (exact cosine similarity); FP16_INDEX stores float16,
+  IVFPQ_MIN_ROWS switches large types to approximate IVF-PQ
 - Surface-level indexing (not entity-level)
 """
 
@@ -23,6 +24,13 @@ import faiss
 import torch
 from transformers import AutoTokenizer, AutoModel
 
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+except ImportError:
+    ORTModelForFeatureExtraction = None
+
+from sapbert_cache import SurfaceEmbeddingCache, encoder_key
+
 # ===============================
 # Paths & config
 # ===============================
@@ -33,15 +41,56 @@ OUTPUT_ROOT = "indices/sapbert"
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 BATCH_SIZE = 64
 MAX_LENGTH = 64  # Surface forms are short biomedical names; 64 is sufficient
+# float16 storage (IndexScalarQuantizer QT_fp16): half the index size and scan
+# bandwidth; queries stay float32. Off keeps the exact IndexFlatIP.
+FP16_INDEX = False
+# Approximate IVF-PQ search (~90%+ recall, far faster and smaller at
+# millions of rows) for types with at least this many rows. None keeps exact
+# search at any size. PQ_M must divide the embedding dimension (768 / 96).
+IVFPQ_MIN_ROWS = None  # e.g. 50_000
+PQ_M = 96
+IVF_NPROBE = 16  # stored in the index; lists scanned per query
+# Per-surface vectors persisted across runs (see sapbert_cache.py); None
+# re-encodes every surface.
+EMBED_CACHE = ".cache/sapbert/embeddings.sqlite"
+# torch.compile the encoder on CUDA (CUDA graphs, fewer kernel launches for
+# these short batches). Needs PyTorch 2.x with Triton, so off by default.
+TORCH_COMPILE = False
 
 # ===============================
 # Load SapBERT (offline only)
 # ===============================
 tokenizer = AutoTokenizer.from_pretrained(SAPHBERT_MODEL_PATH, local_files_only=True)
 
-model = AutoModel.from_pretrained(SAPHBERT_MODEL_PATH, local_files_only=True).to(DEVICE)
-
-model.eval()
+if DEVICE == "cpu" and ORTModelForFeatureExtraction is not None:
+    # ONNX Runtime (fused attention/LayerNorm/GELU kernels) is several times
+    # faster than eager PyTorch on CPU; the call signature and outputs match.
+    model = ORTModelForFeatureExtraction.from_pretrained(
+        SAPHBERT_MODEL_PATH, export=True, local_files_only=True, provider="CPUExecutionProvider"
+    )
+    encoder_variant = "cls-ort-fp32"
+else:
+    model = AutoModel.from_pretrained(SAPHBERT_MODEL_PATH, local_files_only=True).to(DEVICE)
+    model.eval()
+    encoder_variant = f"cls-{DEVICE}-fp32"
+    if DEVICE == "cuda":
+        # FP16 weights: ~2x encoder throughput on tensor cores; vectors are
+        # upcast before normalisation.
+        model.half()
+        encoder_variant = "cls-cuda-fp16"
+        if TORCH_COMPILE:
+            model = torch.compile(model, mode="reduce-overhead")
+            encoder_variant += "-compiled"
+
+embed_cache = (
+    SurfaceEmbeddingCache(
+        EMBED_CACHE,
+        encoder_key(SAPHBERT_MODEL_PATH, MAX_LENGTH, encoder_variant),
+        model.config.hidden_size,
+    )
+    if EMBED_CACHE
+    else None
+)
 
 # ===============================
 # Load entity catalog & prepare rows
@@ -95,29 +144,40 @@ for etype, rows in type_to_rows.items():
 # Embedding function ([CLS] + L2)
 # ===============================
 def embed_surfaces(surface_list):
-    vectors = []
-
-    with torch.no_grad():
-        for i in range(0, len(surface_list), BATCH_SIZE):
-            batch = surface_list[i : i + BATCH_SIZE]
-
-            encoded = tokenizer(
-                batch,
-                padding=True,
-                truncation=True,
-                max_length=MAX_LENGTH,
+    # Length-sorted batches: each one is padded only to its own longest
+    # surface instead of whatever long name happens to share its slice.
+    encodings = tokenizer(surface_list, truncation=True, max_length=MAX_LENGTH)
+    order = np.argsort([len(ids) for ids in encodings["input_ids"]], kind="stable")
+    vectors = np.empty((len(surface_list), model.config.hidden_size), dtype=np.float32)
+
+    with torch.inference_mode():
+        for i in range(0, len(order), BATCH_SIZE):
+            idx = order[i : i + BATCH_SIZE]
+
+            encoded = tokenizer.pad(
+                {k: [v[j] for j in idx] for k, v in encodings.items()},
+                # Lengths rounded up to a multiple of 8 on CUDA: tensor-core
+                # friendly, and at most MAX_LENGTH / 8 shapes to compile.
+                pad_to_multiple_of=8 if DEVICE == "cuda" else None,
                 return_tensors="pt",
             )
 
-            encoded = {k: v.to(DEVICE) for k, v in encoded.items()}
+            # Pinned host tensors make the host-to-device copy asynchronous,
+            # so it is queued behind the previous batch instead of stalling.
+            if DEVICE == "cuda":
+                encoded = {
+                    k: v.pin_memory().to(DEVICE, non_blocking=True)
+                    for k, v in encoded.items()
+                }
             outputs = model(**encoded)
 
-            cls_vecs = outputs.last_hidden_state[:, 0, :]
-            cls_vecs = torch.nn.functional.normalize(cls_vecs, p=2, dim=1)
+            cls_vecs = outputs.last_hidden_state[:, 0, :].float()
 
-            vectors.append(cls_vecs.cpu().numpy())
+            vectors[idx] = cls_vecs.cpu().numpy()
 
-    return np.vstack(vectors)
+    # One in-place SIMD pass over the whole matrix instead of a kernel per batch.
+    faiss.normalize_L2(vectors)
+    return vectors
 
 
 # ===============================
@@ -129,11 +189,36 @@ for entity_type, rows in type_to_rows.items():
 
     print(f"\nIndexing {entity_type} surfaces...")
 
-    surfaces = [r["surface"] for r in rows]
-    embeddings = embed_surfaces(surfaces)
+    # The same surface recurs across kg_ids (e.g. RxNorm and DrugBank synonyms);
+    # encode each distinct string once and gather rows by index.
+    surface_ix = {}
+    for r in rows:
+        surface_ix.setdefault(r["surface"], len(surface_ix))
+    if embed_cache is not None:
+        uniq_vecs, n_encoded = embed_cache.embed(list(surface_ix), embed_surfaces)
+        print(f"  Encoded {n_encoded} new surfaces, {len(surface_ix) - n_encoded} cached")
+    else:
+        uniq_vecs = embed_surfaces(list(surface_ix))
+    embeddings = uniq_vecs[
+        np.fromiter((surface_ix[r["surface"]] for r in rows), dtype=np.int64, count=len(rows))
+    ]
 
     dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)
+    if IVFPQ_MIN_ROWS is not None and len(embeddings) >= IVFPQ_MIN_ROWS:
+        nlist = int(2 * np.sqrt(len(embeddings)))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(
+            quantizer, dim, nlist, PQ_M, 8, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(embeddings)
+        index.nprobe = IVF_NPROBE
+    elif FP16_INDEX:
+        index = faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(embeddings)
+    else:
+        index = faiss.IndexFlatIP(dim)
     index.add(embeddings)
 
     out_dir = os.path.join(OUTPUT_ROOT, entity_type.capitalize())
@@ -1,7 +1,11 @@
 ﻿# -*- coding: utf-8 -*-
 # Build surface->CUI mapping from (CUI -> [surfaces]) + optional overlay.
 import json, argparse, sys
-from collections import defaultdict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 ap = argparse.ArgumentParser()
 ap.add_argument("--in", dest="in_path", required=True)
@@ -31,19 +35,25 @@ def merge_overlay(base, overlay):
 cui2 = load_cui2surfs(args.in_path)
 cui2 = merge_overlay(cui2, args.overlay_path)
 
-surf2 = defaultdict(set)
+# Each CUI's surfaces are deduplicated up front, so a CUI is appended to a
+# surface's list at most once and plain lists can stand in for sets.
+surf2 = {}
 for cui, surfs in cui2.items():
-    for s in surfs:
-        s = s.strip()
-        if not s:
-            continue
-        surf2[s.lower()].add(cui)
-
-# convert sets to sorted lists for JSON
-surf2 = {k: sorted(v) for k, v in surf2.items()}
-
-with open(args.out_path, "w", encoding="utf-8") as f:
-    json.dump(surf2, f, ensure_ascii=False, indent=2)
+    for key in dict.fromkeys(s.strip().lower() for s in surfs):
+        if key:
+            surf2.setdefault(key, []).append(cui)
+
+for cuis in surf2.values():
+    cuis.sort()
+
+# orjson's indented output is byte-identical to json.dump(indent=2,
+# ensure_ascii=False), without json.dump's pure-Python encoding loop.
+if orjson is not None:
+    with open(args.out_path, "wb") as f:
+        f.write(orjson.dumps(surf2, option=orjson.OPT_INDENT_2))
+else:
+    with open(args.out_path, "w", encoding="utf-8") as f:
+        json.dump(surf2, f, ensure_ascii=False, indent=2)
 
 print(
     f"Built surface->CUI: {len(surf2)} surfaces from {len(cui2)} CUIs -> {args.out_path}"
@@ -14,6 +14,8 @@ import json
 import argparse
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 
 import numpy as np
 import torch
@@ -36,6 +38,17 @@ def normalize_text(s: str):
     return " ".join((s or "").lower().strip().split())
 
 
+def build_hnsw(vecs, omp_threads):
+    """HNSW (M=32, inner product) over ``vecs``, using ``omp_threads`` OpenMP threads."""
+    # FAISS releases the GIL during add and the OpenMP thread count is
+    # per calling thread, so several of these can build side by side.
+    faiss.omp_set_num_threads(omp_threads)
+    index = faiss.IndexHNSWFlat(vecs.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = 40
+    index.add(vecs)
+    return index
+
+
 # -------------------------------------------------------
 # 2. Arguments
 # -------------------------------------------------------
@@ -69,13 +82,13 @@ kg_nodes = set()
 
 with open(args.kg, "r", encoding="utf-8", newline="") as f:
     r = csv.reader(f)
-    rows = list(r)
 
-    # Skip header if present
-    if rows and rows[0] and rows[0][0].lower() in ("h", "head", "source"):
-        rows = rows[1:]
+    # Skip header if present; rows are streamed, never held in memory
+    first = next(r, None)
+    if first and first[0].lower() not in ("h", "head", "source"):
+        r = chain([first], r)
 
-    for h, rel, t in rows:
+    for h, rel, t in r:
         h = h.strip()
         t = t.strip()
         if h:
@@ -104,33 +117,29 @@ if not typed_nodes:
 base_dict = load_json(args.dict)
 overlay = load_json(args.overlay)
 
-# Merge overlay synonyms into base_dict
-for cui, syns in overlay.items():
-    base = base_dict.setdefault(cui, [])
-    seen_norm = {normalize_text(s) for s in base}
-    for s in syns:
-        ns = normalize_text(s)
-        if ns and ns not in seen_norm:
-            base.append(s)
-            seen_norm.add(ns)
-
 
 # -------------------------------------------------------
 # 5. Build (kg_id → unique normalized surfaces)
 # -------------------------------------------------------
 
+# Overlay synonyms are merged per node as a set union of normalized forms,
+# which is what appending only unseen overlay entries used to amount to.
+# Nodes are visited in KG order so row ids are stable from run to run;
+# nodes with no dictionary or overlay entries are skipped before normalizing.
 node2surfs = {}
-for cui, tp in typed_nodes.items():
-    surfs = base_dict.get(cui, [])
-    clean = []
-
-    for s in surfs:
-        ns = normalize_text(s)
-        if ns and len(ns) >= 3:
-            clean.append(ns)
+for cui in typed_nodes:
+    if cui not in base_dict and cui not in overlay:
+        continue
+    clean = {
+        ns
+        for ns in map(
+            normalize_text, chain(base_dict.get(cui, ()), overlay.get(cui, ()))
+        )
+        if len(ns) >= 3
+    }
 
     if clean:
-        node2surfs[cui] = sorted(set(clean))
+        node2surfs[cui] = sorted(clean)
 
 
 # -------------------------------------------------------
@@ -160,7 +169,7 @@ mdl = AutoModel.from_pretrained(args.model).to(device).eval()
 
 
 def encode_batch(batch_texts):
-    """Encode a batch of texts into L2-normalized SapBERT embeddings."""
+    """Encode a batch of texts into mean-pooled SapBERT embeddings (unnormalized)."""
     with torch.no_grad():
         x = tok(
             batch_texts,
@@ -172,74 +181,69 @@ def encode_batch(batch_texts):
         out = mdl(**x).last_hidden_state  # [B, L, H]
         mask = x["attention_mask"].unsqueeze(-1)  # [B, L, 1]
         pooled = (out * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
-        pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
     return pooled.cpu().numpy().astype("float32")
 
 
-embs_list = []
+# Batches are written straight into the final matrix; no list + vstack copy.
+embs = np.empty((len(texts), mdl.config.hidden_size), dtype=np.float32)
 for i in range(0, len(texts), args.batch):
     batch = texts[i : i + args.batch]
-    emb = encode_batch(batch)
-    embs_list.append(emb)
-
-embs = np.vstack(embs_list).astype("float32")
+    embs[i : i + len(batch)] = encode_batch(batch)
+# L2-normalize once, in place, rather than per batch on the device.
+faiss.normalize_L2(embs)
 
 if embs.shape[0] != len(pairs):
     raise SystemExit("Embedding count mismatch.")
 
 
 # -------------------------------------------------------
-# 8. Build combined FAISS index
+# 8. Build combined + per-type FAISS indexes (Drug, Disease)
 # -------------------------------------------------------
 
-dim = embs.shape[1]
-index_combined = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
-index_combined.hnsw.efConstruction = 40
-index_combined.add(embs)
+per_type = defaultdict(list)  # type → row numbers into pairs/embs
+for i, (_, _, tp) in enumerate(pairs):
+    per_type[tp].append(i)
 
-# Write combined index + metadata
-faiss.write_index(index_combined, str(Path(args.out_dir, "index.faiss")))
-np.save(str(Path(args.out_dir, "vectors.npy")), embs)
-
-cui_map = [{"cui": cui, "name": surface} for (cui, surface, _) in pairs]
-with open(Path(args.out_dir, "cui_map.json"), "w", encoding="utf-8") as f:
-    json.dump(cui_map, f, ensure_ascii=False, indent=2)
-
-
-# -------------------------------------------------------
-# 9. Build per-type FAISS indexes (Drug, Disease)
-# -------------------------------------------------------
+# The combined and per-type indexes are independent; build them concurrently
+# and split the cores between the builds.
+n_builds = 1 + len(per_type)
+omp_threads = max(1, (os.cpu_count() or 1) // n_builds)
+with ThreadPoolExecutor(max_workers=n_builds) as ex:
+    combined_future = ex.submit(build_hnsw, embs, omp_threads)
+    type_futures = {
+        tp: ex.submit(build_hnsw, embs[rows], omp_threads)
+        for tp, rows in per_type.items()
+    }
 
-per_type = defaultdict(list)
-for (cui, surface, tp), vec in zip(pairs, embs):
-    per_type[tp].append((cui, surface, vec))
+    # Write combined index + metadata
+    faiss.write_index(combined_future.result(), str(Path(args.out_dir, "index.faiss")))
+    np.save(str(Path(args.out_dir, "vectors.npy")), embs)
 
-for tp, entries in per_type.items():
-    tp_dir = Path(args.out_dir, tp)
-    tp_dir.mkdir(parents=True, exist_ok=True)
+    cui_map = [{"cui": cui, "name": surface} for (cui, surface, _) in pairs]
+    with open(Path(args.out_dir, "cui_map.json"), "w", encoding="utf-8") as f:
+        json.dump(cui_map, f, ensure_ascii=False, indent=2)
 
-    # Build FAISS for this type
-    vecs = np.vstack([v for (_, _, v) in entries])
-    idx = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
-    idx.hnsw.efConstruction = 40
-    idx.add(vecs)
+    for tp, rows in per_type.items():
+        tp_dir = Path(args.out_dir, tp)
+        tp_dir.mkdir(parents=True, exist_ok=True)
 
-    faiss.write_index(idx, str(tp_dir / "index.faiss"))
+        faiss.write_index(type_futures[tp].result(), str(tp_dir / "index.faiss"))
 
-    # Write rows.jsonl
-    with open(tp_dir / "rows.jsonl", "w", encoding="utf-8") as f:
-        for cui, surface, _ in entries:
-            json.dump({"kg_id": cui, "text": surface}, f, ensure_ascii=False)
-            f.write("\n")
+        # Write rows.jsonl
+        with open(tp_dir / "rows.jsonl", "w", encoding="utf-8") as f:
+            for i in rows:
+                cui, surface, _ = pairs[i]
+                json.dump({"kg_id": cui, "text": surface}, f, ensure_ascii=False)
+                f.write("\n")
 
 
 # -------------------------------------------------------
-# 10. Final Summary
+# 9. Final Summary
 # -------------------------------------------------------
 
 print("\n[SUCCESS] Type-Aware SapBERT Index Built")
 print(f"  Total surfaces encoded: {len(pairs)}")
 print(f"  Output directory: {args.out_dir}")
 
-for tp, entries in per_type.items():
-    print(f"  {tp}: {len(entries)} entries")
+for tp, rows in per_type.items():
+    print(f"  {tp}: {len(rows)} entries")
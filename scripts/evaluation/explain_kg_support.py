@@ -1,4 +1,20 @@
-﻿import csv, json, io, argparse, os
+﻿import csv, json, io, argparse, os, sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def loads_json(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 def load_overlay(path):
@@ -6,6 +22,16 @@ def load_overlay(path):
         return json.load(f)
 
 
+def edge_key(h, r, t):
+    """
+    Membership key for a KG edge: its 64-bit xxh3 hash when xxhash is
+    installed (one small int per edge, collisions ~2^-64), else the tuple.
+    """
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(f"{h}\x1f{r}\x1f{t}".encode("utf-8"))
+    return (h, r, t)
+
+
 def load_kg(path):
     edges = set()
     with io.open(path, "r", encoding="utf-8") as f:
@@ -13,8 +39,9 @@ def load_kg(path):
         for row in rdr:
             if len(row) != 3:
                 continue
-            h, r, t = [x.strip() for x in row]
-            edges.add((h, r, t))
+            # interned so tuple keys share one string per node/relation
+            h, r, t = [sys.intern(x.strip()) for x in row]
+            edges.add(edge_key(h, r, t))
     return edges
 
 
@@ -35,9 +62,9 @@ def main():
     kg = load_kg(args.kg)
 
     rows = []
-    with io.open(args.queries, "r", encoding="utf-8") as f:
+    with io.open(args.queries, "rb", buffering=1 << 20) as f:
         for i, line in enumerate(f, 1):
-            q = json.loads(line)
+            q = loads_json(line)
             head, r1, t1, r2, t2 = (
                 q["head"],
                 q["rel1"],
@@ -45,8 +72,8 @@ def main():
                 q["rel2"],
                 q["tail2"],
             )
-            e1 = (head, r1, t1)
-            e2 = (head, r2, t2)
+            e1 = edge_key(head, r1, t1)
+            e2 = edge_key(head, r2, t2)
 
             hs = first_surface(overlay, head)
             t1s = first_surface(overlay, t1)
@@ -6,18 +6,37 @@ def main():
     ap.add_argument("--explain_csv", required=True)
     args = ap.parse_args()
 
-    rows = list(csv.DictReader(io.open(args.explain_csv, "r", encoding="utf-8")))
-    total = len(rows)
-    both = sum(1 for r in rows if r["both_edges_present"] == "True")
-    e1 = sum(1 for r in rows if r["edge1_present"] == "True")
-    e2 = sum(1 for r in rows if r["edge2_present"] == "True")
-    link_ok = sum(
-        1
-        for r in rows
-        if r["head_surface_link_ok"] == "True"
-        and r["tail1_surface_link_ok"] == "True"
-        and r["tail2_surface_link_ok"] == "True"
-    )
+    # One streaming pass over plain rows; only the flag columns are looked at.
+    total = both = e1 = e2 = link_ok = 0
+    with io.open(args.explain_csv, "r", encoding="utf-8", newline="") as f:
+        rdr = csv.reader(f)
+        hdr = next(rdr)
+        both_i = hdr.index("both_edges_present")
+        e1_i = hdr.index("edge1_present")
+        e2_i = hdr.index("edge2_present")
+        link_is = [
+            hdr.index(name)
+            for name in (
+                "head_surface_link_ok",
+                "tail1_surface_link_ok",
+                "tail2_surface_link_ok",
+            )
+        ]
+        width = max(both_i, e1_i, e2_i, *link_is) + 1
+        for row in rdr:
+            if not row:
+                continue  # blank line, skipped like DictReader does
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            total += 1
+            if row[both_i] == "True":
+                both += 1
+            if row[e1_i] == "True":
+                e1 += 1
+            if row[e2_i] == "True":
+                e2 += 1
+            if all(row[i] == "True" for i in link_is):
+                link_ok += 1
 
     print(f"[summary] queries={total}")
     print(f"          both_edges_present={both} ({both/total:.1%})")
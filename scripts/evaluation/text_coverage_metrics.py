@@ -1,43 +1,62 @@
 ﻿import argparse, io, json, csv, re, os
+from bisect import bisect_left
 from collections import defaultdict
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def load_queries(path):
-    qs = []
-    with io.open(path, "r", encoding="utf-8") as f:
+
+def loads_json(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def iter_jsonl(path, ignore_decode_errors=False):
+    """Parsed non-blank lines of a JSONL file, read as bytes through a 1 MiB buffer."""
+    with io.open(path, "rb", buffering=1 << 20) as f:
         for line in f:
             if not line.strip():
                 continue
-            j = json.loads(line)
-            # tolerate older query format (no qid)
-            j["_qid"] = j.get("qid") or len(qs) + 1
-            # prefer require_entities if present; else fall back to boost_terms or surface strings
-            req = j.get("require_entities") or j.get("boost_terms") or []
-            # normalize to unique, non-empty
-            seen = set()
-            req_clean = []
-            for s in req:
-                s2 = (s or "").strip()
-                if s2 and s2.lower() not in seen:
-                    seen.add(s2.lower())
-                    req_clean.append(s2)
-            j["_require"] = req_clean
-            qs.append(j)
+            try:
+                yield loads_json(line)
+            except ValueError:
+                if not ignore_decode_errors:
+                    raise
+                # invalid UTF-8: drop the bad bytes, as errors="ignore" did
+                yield loads_json(line.decode("utf-8", "ignore"))
+
+
+def load_queries(path):
+    qs = []
+    for j in iter_jsonl(path):
+        # tolerate older query format (no qid)
+        j["_qid"] = j.get("qid") or len(qs) + 1
+        # prefer require_entities if present; else fall back to boost_terms or surface strings
+        req = j.get("require_entities") or j.get("boost_terms") or []
+        # normalize to unique, non-empty
+        seen = set()
+        req_clean = []
+        for s in req:
+            s2 = (s or "").strip()
+            if s2 and s2.lower() not in seen:
+                seen.add(s2.lower())
+                req_clean.append(s2)
+        j["_require"] = req_clean
+        qs.append(j)
     return qs
 
 
 def load_corpus(path):
     """Expect docs.jsonl with at least {id, text} or {doc_id, text}."""
     m = {}
-    with io.open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            j = json.loads(line)
-            did = j.get("id") or j.get("doc_id")
-            if not did:
-                continue
-            m[did] = j.get("text", "")
+    for j in iter_jsonl(path, ignore_decode_errors=True):
+        did = j.get("id") or j.get("doc_id")
+        if not did:
+            continue
+        m[did] = j.get("text", "")
     return m
 
 
@@ -58,26 +77,35 @@ def _hit_doc_id(hit):
 def load_cache(path):
     """Expect JSONL lines with at least {qid, hits} OR {query_index, hits} OR in-order with implicit qid."""
     records = []
-    with io.open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            j = json.loads(line)
-            qid = j.get("qid") or j.get("query_index")
-            records.append((qid, j.get("hits") or j.get("retrieved") or []))
+    for j in iter_jsonl(path, ignore_decode_errors=True):
+        qid = j.get("qid") or j.get("query_index")
+        records.append((qid, j.get("hits") or j.get("retrieved") or []))
     # If qids missing, fill sequentially starting at 1
     if any(qid is None for qid, _ in records):
         records = list(enumerate([h for _, h in records], start=1))
     return records  # list of (qid, hits)
 
 
-def entities_in_text(text, entities):
-    t = text.lower()
-    found = set()
+def entity_first_k(docs, entities):
+    """
+    Maps each entity found in ``docs`` (case-insensitive) to the smallest k
+    whose top-k docs, joined with spaces, contain it. One scan of the joined
+    text per entity serves every cutoff k.
+    """
+    lowered = [d.lower() for d in docs]
+    text = " ".join(lowered)
+    doc_ends = []  # exclusive end offset of each doc within text
+    end = -1
+    for d in lowered:
+        end += len(d) + 1
+        doc_ends.append(end)
+    first_k = {}
     for e in entities:
-        if e.lower() in t:
-            found.add(e)
-    return found
+        el = e.lower()
+        pos = text.find(el)
+        if pos >= 0:
+            first_k[e] = bisect_left(doc_ends, pos + len(el)) + 1
+    return first_k
 
 
 def main():
@@ -117,9 +145,9 @@ def main():
                 continue
             ranked_docs.append(doc_map.get(did, ""))
 
+        first_k = entity_first_k(ranked_docs, req)
         for k in args.ks:
-            top_text = " ".join(ranked_docs[:k])
-            found = entities_in_text(top_text, req)
+            found = {e for e, fk in first_k.items() if fk <= k}
             missing = [e for e in req if e not in found]
             status = (
                 "complete"
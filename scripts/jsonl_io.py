@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+JSONL read/write helpers shared by the analyzer, the NER worker and the phase03
+catalog builder; orjson is used when it is installed.
+
+Both paths emit equivalent JSON for str/int/finite-float payloads, but not always
+the same bytes: orjson spells some floats differently (1e-05 -> 0.00001) and
+writes NaN/Infinity as null.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads_json(data):
+    """Parses one JSON document (str or bytes)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_json_line(obj) -> bytes:
+    """Compact UTF-8 JSON plus newline. Non-str dict keys are stringified as json does."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+    return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode(
+        "utf-8"
+    )
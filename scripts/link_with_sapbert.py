@@ -2,7 +2,14 @@
 import os, json, csv, argparse, re
 import numpy as np
 from sentence_transformers import SentenceTransformer
-import nmslib
+import faiss
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from sapbert_cache import SurfaceEmbeddingCache, encoder_key
 
 ap = argparse.ArgumentParser()
 ap.add_argument("--in_raw", required=True)
@@ -13,6 +20,11 @@ ap.add_argument("--overlay", required=True)
 ap.add_argument("--index_dir", required=True)
 ap.add_argument("--model", default="cambridgeltl/SapBERT-from-PubMedBERT-fulltext")
 ap.add_argument("--k", type=int, default=8)
+ap.add_argument(
+    "--embed_cache",
+    default=".cache/sapbert/embeddings.sqlite",
+    help="SQLite cache of mention embeddings reused across runs ('' disables)",
+)
 args = ap.parse_args()
 
 # --- load KG nodes ---
@@ -81,8 +93,23 @@ for v in cui2.values():
 surfaces = sorted(surfset)
 
 
+# Aho-Corasick finds every dictionary surface occurring in a query in one
+# pass over the text, instead of one substring test per surface.
+mention_automaton = None
+if ahocorasick is not None and any(len(s) >= 4 for s in surfaces):
+    mention_automaton = ahocorasick.Automaton()
+    for s in surfaces:
+        if len(s) >= 4:
+            mention_automaton.add_word(s, s)
+    mention_automaton.make_automaton()
+
+
 def find_mentions(text):
     ql = text.lower()
+    if mention_automaton is not None:
+        return sorted({s for _, s in mention_automaton.iter(ql)})
+    if ahocorasick is not None:
+        return []  # no surface is long enough to match
     found = set()
     for s in surfaces:
         if len(s) >= 4 and s in ql:
@@ -95,25 +122,59 @@ pairs = json.load(open(os.path.join(args.index_dir, "ids.json"), encoding="utf-8
     "pairs"
 ]
 embs = np.load(os.path.join(args.index_dir, "vectors.npy"))
-index = nmslib.init(method="hnsw", space="cosinesimil")
-index.loadIndex(os.path.join(args.index_dir, "nmslib_index.bin"))
+index = faiss.read_index(os.path.join(args.index_dir, "index.faiss"))
+index.hnsw.efSearch = max(index.hnsw.efSearch, args.k)
 
 # reverse lookup: surface row -> node_id
 row2node = [p[0] for p in pairs]
 
 # model for mention encoding
 model = SentenceTransformer(args.model)
+# SentenceTransformer mean-pools SapBERT unless the model ships its own pooling
+# config, while the index builders cache CLS vectors; the tag keeps the two
+# apart in a shared cache file.
+pooling = next(
+    (m.get_pooling_mode_str() for m in model if hasattr(m, "get_pooling_mode_str")),
+    "none",
+)
+encoder_variant = f"st-{pooling}-{model.device.type}-fp32"
+embed_cache = (
+    SurfaceEmbeddingCache(
+        args.embed_cache,
+        encoder_key(args.model, model.max_seq_length, encoder_variant),
+        model.get_sentence_embedding_dimension(),
+    )
+    if args.embed_cache
+    else None
+)
 
 BAN = {"disease_adverse_effects", "disease_side_effect"}
 
 
-def nearest_nodes(surface_text, topk):
-    v = model.encode(
-        [surface_text], convert_to_numpy=True, normalize_embeddings=True
+# distinct mentions encoded per batch; bounds memory on large inputs
+MENTION_WINDOW = 4096
+
+
+def encode_surfaces(surfaces):
+    return model.encode(
+        surfaces,
+        batch_size=64,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
     ).astype("float32")
-    idxs, dists = index.knnQuery(v[0], k=topk)
-    nodes = [row2node[i] for i in idxs]
-    return nodes, dists
+
+
+def nearest_nodes_batch(surfaces, topk):
+    """Top-k KG nodes per surface, from one batched encode and one index search."""
+    if embed_cache is not None:
+        v, _ = embed_cache.embed(surfaces, encode_surfaces)
+    else:
+        v = encode_surfaces(surfaces)
+    # One call for the whole batch; FAISS spreads the queries over all cores
+    # with OpenMP (faiss.omp_set_num_threads caps it).
+    _, idxs = index.search(v, topk)
+    return [[row2node[i] for i in row if i >= 0] for row in idxs]
 
 
 def choose_head(candidates):
@@ -132,21 +193,15 @@ def choose_head(candidates):
     return None
 
 
-with open(args.out_enriched, "w", encoding="utf-8") as w, open(
-    args.in_raw, encoding="utf-8"
-) as r:
-    for line in r:
-        if not line.strip():
-            continue
-        ex = json.loads(line)
-        qid, text = ex.get("qid"), ex.get("text", "")
-        rels = detect_relations(text)
-        ments = find_mentions(text)
+def flush(w, pending, window):
+    """Link the new mentions in ``window`` at once, then write the ``pending`` rows."""
+    if window:
+        linked.update(zip(window, nearest_nodes_batch(list(window), args.k)))
+    for qid, text, rels, ments in pending:
         all_nodes = []
-        # SapBERT over each mention, collect top-k nodes
+        # SapBERT top-k nodes of each mention
         for m in ments:
-            nodes, _ = nearest_nodes(m, args.k)
-            all_nodes.extend(nodes)
+            all_nodes.extend(linked[m])
         # keep stable order but unique
         seen = set()
         uniq = []
@@ -165,4 +220,29 @@ with open(args.out_enriched, "w", encoding="utf-8") as w, open(
         }
         w.write(json.dumps(out, ensure_ascii=False) + "\n")
 
+
+with open(args.out_enriched, "w", encoding="utf-8") as w, open(
+    args.in_raw, encoding="utf-8"
+) as r:
+    # Rows are buffered until their distinct mentions fill a window, so
+    # SapBERT sees a few large batches instead of one forward pass per mention.
+    # Mentions repeat across queries; each distinct one is linked only once.
+    pending = []  # (qid, text, relations, mentions)
+    window = {}  # mentions not linked yet, in first-seen order
+    linked = {}  # mention -> top-k nodes
+    for line in r:
+        if not line.strip():
+            continue
+        ex = json.loads(line)
+        qid, text = ex.get("qid"), ex.get("text", "")
+        ments = find_mentions(text)
+        pending.append((qid, text, detect_relations(text), ments))
+        for m in ments:
+            if m not in linked:
+                window.setdefault(m, None)
+        if len(window) >= MENTION_WINDOW:
+            flush(w, pending, window)
+            pending, window = [], {}
+    flush(w, pending, window)
+
 print("Wrote", args.out_enriched)
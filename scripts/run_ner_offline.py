@@ -3,37 +3,53 @@
 run_ner_offline.py
 ------------------
 Runs BC5CDR NER over passages and preserves document IDs.
+
+Two modes:
+  --input/--output   one JSONL file in, one JSONL file out (single model)
+  --serve            long-lived worker: one JSON request per stdin line,
+                     {"models": [...], "docs": [{id, text}, ...]}, answered
+                     with one stdout line {model: [{id, text, ents}, ...]}.
+                     Models are loaded once and reused across requests.
 """
 
-import json
+import os
+import sys
 import spacy
 import argparse
 
+from jsonl_io import dumps_json_line, loads_json
+
+# Components NER does not need; skipping them roughly halves per-doc latency.
+NON_NER_PIPES = ("parser", "tagger", "lemmatizer", "attribute_ruler")
+
 
 def load_jsonl(path):
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "rb") as f:
         for line in f:
             if line.strip():
-                yield json.loads(line)
+                yield loads_json(line)
 
 
-def main():
-    p = argparse.ArgumentParser()
-    p.add_argument("--input", required=True)
-    p.add_argument("--output", required=True)
-    p.add_argument("--model", default="en_ner_bc5cdr_md")
-    args = p.parse_args()
+def load_ner_model(name):
+    nlp = spacy.load(name)
+    nlp.select_pipes(disable=[p for p in NON_NER_PIPES if p in nlp.pipe_names])
+    return nlp
 
-    print(f"[INFO] Loading spaCy model: {args.model}")
-    nlp = spacy.load(args.model)
 
-    with open(args.output, "w", encoding="utf-8") as out:
-        for ex in load_jsonl(args.input):
-            doc_id = ex.get("id") or ex.get("doc_id")
-            text = ex.get("text", "")
+def annotate(nlp, rows):
+    """
+    Yields {id, text, ents} for ``rows``, batching them through nlp.pipe.
 
-            doc = nlp(text)
-            ents = [
+    Rows ride along with their texts (as_tuples), so any iterable streams
+    through without being held in memory.
+    """
+    batch_size = int(os.environ.get("SPACY_BATCH_SIZE", 64))
+    pairs = ((ex.get("text", ""), ex) for ex in rows)
+    for doc, ex in nlp.pipe(pairs, as_tuples=True, batch_size=batch_size):
+        yield {
+            "id": ex.get("id") or ex.get("doc_id"),
+            "text": ex.get("text", ""),
+            "ents": [
                 {
                     "text": ent.text,
                     "label": ent.label_,
@@ -41,18 +57,51 @@ def main():
                     "end": ent.end_char,
                 }
                 for ent in doc.ents
-            ]
-
-            out.write(
-                json.dumps(
-                    {
-                        "id": doc_id,
-                        "text": text,
-                        "ents": ents,
-                    }
-                )
-                + "\n"
-            )
+            ],
+        }
+
+
+def serve():
+    models = {}
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        req = loads_json(line)
+        resp = {}
+        for name in req["models"]:
+            if name not in models:
+                print(f"[INFO] Loading spaCy model: {name}", file=sys.stderr, flush=True)
+                models[name] = load_ner_model(name)
+            # Requests are bounded batches, so each reply is built in memory.
+            resp[name] = list(annotate(models[name], req["docs"]))
+        sys.stdout.buffer.write(dumps_json_line(resp))
+        sys.stdout.buffer.flush()
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--input")
+    p.add_argument("--output")
+    p.add_argument("--model", default="en_ner_bc5cdr_md")
+    p.add_argument(
+        "--serve",
+        action="store_true",
+        help="Answer JSONL requests on stdin until EOF (see module docstring).",
+    )
+    args = p.parse_args()
+
+    if args.serve:
+        serve()
+        return
+    if not args.input or not args.output:
+        p.error("--input and --output are required unless --serve is given")
+
+    print(f"[INFO] Loading spaCy model: {args.model}")
+    nlp = load_ner_model(args.model)
+
+    with open(args.output, "wb", buffering=1 << 20) as out:
+        for row in annotate(nlp, load_jsonl(args.input)):
+            out.write(dumps_json_line(row))
 
     print(f"[DONE] wrote NER JSONL -> {args.output}")
 
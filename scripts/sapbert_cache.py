@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent per-surface SapBERT embedding cache.
+
+Used by build_sapbert_indexes_phase11.py, build_umls_sapbert_index.py and
+link_with_sapbert.py. Vectors are stored in SQLite keyed by (encoder key,
+surface), so a rebuild after a catalog update, or a re-run over the same
+queries, only encodes surfaces that were never seen before. The encoder key
+fingerprints the model (local files, or the hub id), the tokenizer max_length
+and an encoder variant tag (backend, precision, pooling); any change to one of
+them starts a fresh namespace, so vectors from different encoders never mix.
+"""
+
+import hashlib
+import os
+import sqlite3
+
+import numpy as np
+
+# SQLite builds before 3.32 cap bound parameters at 999 per statement.
+_LOOKUP_CHUNK = 900
+
+
+def encoder_key(model_path, max_length, variant):
+    """
+    Short hash of the model directory's files (name, size, mtime), max_length
+    and ``variant``, e.g. "cls-ort-fp32" or "cls-cuda-fp16". A hub model id
+    that is not a local directory is hashed by name.
+    """
+    h = hashlib.sha256()
+    if not os.path.isdir(model_path):
+        h.update(f"model={model_path}\n".encode("utf-8"))
+    for root, dirs, files in os.walk(model_path):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            rel = os.path.relpath(path, model_path)
+            h.update(f"{rel}:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+    h.update(f"max_length={max_length}\nvariant={variant}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class SurfaceEmbeddingCache:
+    def __init__(self, path, key, dim):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS emb ("
+            "key TEXT NOT NULL, surface TEXT NOT NULL, vec BLOB NOT NULL, "
+            "PRIMARY KEY (key, surface)) WITHOUT ROWID"
+        )
+        self.key = key
+        self.dim = dim
+
+    def _lookup(self, surfaces):
+        found = {}
+        for i in range(0, len(surfaces), _LOOKUP_CHUNK):
+            chunk = surfaces[i : i + _LOOKUP_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            found.update(
+                self.conn.execute(
+                    f"SELECT surface, vec FROM emb WHERE key = ? AND surface IN ({marks})",
+                    (self.key, *chunk),
+                )
+            )
+        return found
+
+    def embed(self, surfaces, embed_fn):
+        """
+        Returns (float32 [len(surfaces), dim] vectors, number encoded).
+
+        Cached rows are read back; the rest go through ``embed_fn(list)`` in
+        one call and are stored for the next run.
+        """
+        surfaces = list(surfaces)
+        vectors = np.empty((len(surfaces), self.dim), dtype=np.float32)
+        found = self._lookup(surfaces)
+
+        missing = []
+        for i, s in enumerate(surfaces):
+            blob = found.get(s)
+            if blob is None:
+                missing.append(i)
+            else:
+                vectors[i] = np.frombuffer(blob, dtype=np.float32)
+
+        if missing:
+            new = np.asarray(embed_fn([surfaces[i] for i in missing]), dtype=np.float32)
+            vectors[missing] = new
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO emb (key, surface, vec) VALUES (?, ?, ?)",
+                    ((self.key, surfaces[i], v.tobytes()) for i, v in zip(missing, new)),
+                )
+        return vectors, len(missing)
+
+    def close(self):
+        self.conn.close()
@@ -87,14 +87,32 @@ class ELAdapter:
         Try SapBERT v2 using allowed entity types.
         Returns at most ONE candidate (wrapped in list).
         """
+        return self._sapbert_v2_link_batch([mention_text], relation, slot)[0]
 
-        allowed_types = get_allowed_types(relation, slot)
+    def _sapbert_v2_link_batch(
+        self, mention_texts: List[str], relation: str, slot: str, batch_size: int = 256
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Batched ``_sapbert_v2_link``: each allowed type is tried in order, and
+        only mentions still unresolved go to the next type's batch.
+        """
 
-        for etype in allowed_types:
-            result = self.sapbert_v2.link(mention_text, etype)
+        out: List[List[Dict[str, Any]]] = [[] for _ in mention_texts]
+        pending = list(range(len(mention_texts)))
 
-            if result.get("kg_id") is not None:
-                return [
+        for etype in get_allowed_types(relation, slot):
+            if not pending:
+                break
+            results = self.sapbert_v2.link_batch(
+                [mention_texts[i] for i in pending], etype, batch_size=batch_size
+            )
+
+            still_pending = []
+            for i, result in zip(pending, results):
+                if result.get("kg_id") is None:
+                    still_pending.append(i)
+                    continue
+                out[i] = [
                     {
                         "kg_id": result["kg_id"],
                         "name": result["kg_id"],
@@ -105,21 +123,28 @@ class ELAdapter:
                         "linker": "sapbert_v2",
                     }
                 ]
+            pending = still_pending
 
-        return []
+        return out
 
     # --------------------------------------------------------
     # Routed linking (SapBERT v2 → optional legacy)
     # --------------------------------------------------------
 
     def _routed_link(
-        self, mention_text: str, relation: str, slot: str, topk: Optional[int] = None
+        self,
+        mention_text: str,
+        relation: str,
+        slot: str,
+        topk: Optional[int] = None,
+        sapbert_cands: Optional[List[Dict[str, Any]]] = None,
     ) -> List[Dict[str, Any]]:
 
-        # 1️⃣ Primary SapBERT v2
-        cands = self._sapbert_v2_link(mention_text, relation, slot)
-        if cands:
-            return cands
+        # 1️⃣ Primary SapBERT v2 (precomputed when called from a batch)
+        if sapbert_cands is None:
+            sapbert_cands = self._sapbert_v2_link(mention_text, relation, slot)
+        if sapbert_cands:
+            return sapbert_cands
 
         # 2️⃣ Optional legacy linker (if provided)
         if self.linker is None:
@@ -163,11 +188,34 @@ class ELAdapter:
         slot: str,
         topk: Optional[int] = None,
     ) -> List[List[Dict[str, Any]]]:
+        return self.link_mentions_batch(question, mentions, relation, slot, topk=topk)
+
+    def link_mentions_batch(
+        self,
+        question: str,
+        mentions: List[str],
+        relation: str,
+        slot: str,
+        topk: Optional[int] = None,
+        batch_size: int = 256,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Link a flat list of mentions (e.g. every tail mention of every passage
+        retrieved for a question). Distinct surfaces are encoded together in
+        ``batch_size`` chunks; results line up with ``mentions``.
+        """
+
+        uniq = list(dict.fromkeys(mentions))
+        sapbert_by_surface = dict(
+            zip(uniq, self._sapbert_v2_link_batch(uniq, relation, slot, batch_size))
+        )
 
         results: List[List[Dict[str, Any]]] = []
 
         for m in mentions:
-            cands = self._routed_link(m, relation, slot, topk=topk)
+            cands = self._routed_link(
+                m, relation, slot, topk=topk, sapbert_cands=sapbert_by_surface[m]
+            )
             cands = self._normalize_candidates(cands)
 
             # annotate surface
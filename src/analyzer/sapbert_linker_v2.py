@@ -63,6 +63,10 @@ class SapBERTLinkerV2:
         self.model = AutoModel.from_pretrained(
             SAPBERT_MODEL_PATH, local_files_only=True
         ).to(DEVICE)
+        if DEVICE == "cuda":
+            # FP16 weights halve memory traffic and run the matmuls on tensor
+            # cores; the CLS vectors are cast back to float32 for FAISS.
+            self.model.half()
         self.model.eval()
 
         # Load FAISS indexes and row metadata
@@ -89,25 +93,33 @@ class SapBERTLinkerV2:
             self.rows_by_type[etype.lower()] = rows
 
     # --------------------------------------------------------
-    # Embed a single surface string
+    # Embed surface strings (batched forward passes)
     # --------------------------------------------------------
 
+    def _embed_batch(self, surfaces: List[str], batch_size: int = 256) -> np.ndarray:
+        chunks = []
+        with torch.inference_mode():
+            for start in range(0, len(surfaces), batch_size):
+                encoded = self.tokenizer(
+                    surfaces[start : start + batch_size],
+                    padding=True,
+                    truncation=True,
+                    max_length=MAX_LENGTH,
+                    return_tensors="pt",
+                )
+                encoded = {k: v.to(DEVICE) for k, v in encoded.items()}
+
+                outputs = self.model(**encoded)
+                cls_vec = outputs.last_hidden_state[:, 0, :].float()
+                cls_vec = torch.nn.functional.normalize(cls_vec, p=2, dim=1)
+                chunks.append(cls_vec.cpu().numpy())
+
+        if not chunks:
+            return np.empty((0, self.model.config.hidden_size), dtype=np.float32)
+        return np.concatenate(chunks)
+
     def _embed(self, surface: str) -> np.ndarray:
-        with torch.no_grad():
-            encoded = self.tokenizer(
-                surface,
-                padding=True,
-                truncation=True,
-                max_length=MAX_LENGTH,
-                return_tensors="pt",
-            )
-            encoded = {k: v.to(DEVICE) for k, v in encoded.items()}
-
-            outputs = self.model(**encoded)
-            cls_vec = outputs.last_hidden_state[:, 0, :]
-            cls_vec = torch.nn.functional.normalize(cls_vec, p=2, dim=1)
-
-        return cls_vec.cpu().numpy()
+        return self._embed_batch([surface])
 
     # --------------------------------------------------------
     # Public API
@@ -126,30 +138,54 @@ class SapBERTLinkerV2:
               "source": str
             }
         """
+        return self.link_batch([surface], entity_type)[0]
+
+    def link_batch(
+        self, surfaces: List[str], entity_type: str, batch_size: int = 256
+    ) -> List[Dict[str, Any]]:
+        """
+        Batched ``link``: one encoder pass per ``batch_size`` surfaces and a
+        single FAISS search. Returns one result dict per surface, in order.
+        """
 
         entity_type = entity_type.lower()
 
         if entity_type not in self.index_by_type:
-            return {
-                "surface": surface,
-                "entity_type": entity_type,
-                "kg_id": None,
-                "score": 0.0,
-                "source": "sapbert_invalid_type",
-            }
-
-        # Embed query
-        query_vec = self._embed(surface)
+            return [
+                {
+                    "surface": surface,
+                    "entity_type": entity_type,
+                    "kg_id": None,
+                    "score": 0.0,
+                    "source": "sapbert_invalid_type",
+                }
+                for surface in surfaces
+            ]
+        if not surfaces:
+            return []
+
+        # Embed queries
+        query_vecs = self._embed_batch(surfaces, batch_size=batch_size)
 
         # Search FAISS
         index = self.index_by_type[entity_type]
         rows = self.rows_by_type[entity_type]
 
-        scores, indices = index.search(query_vec, TOP_K)
-
-        scores = scores[0]
-        indices = indices[0]
-
+        all_scores, all_indices = index.search(query_vecs, TOP_K)
+
+        return [
+            self._result(surface, entity_type, rows, scores, indices)
+            for surface, scores, indices in zip(surfaces, all_scores, all_indices)
+        ]
+
+    def _result(
+        self,
+        surface: str,
+        entity_type: str,
+        rows: List[Dict[str, Any]],
+        scores: np.ndarray,
+        indices: np.ndarray,
+    ) -> Dict[str, Any]:
         if len(indices) == 0:
             return {
                 "surface": surface,
@@ -297,30 +297,85 @@ class TextRetriever:
         return {t: (w / total) for t, w in top}
 
     # ------------------------------ retrieve ------------------------------
-    def retrieve(
-        self, query: str, topk: int = 50, k1: float = 1.5, b: float = 0.75
-    ) -> List[Tuple[str, float]]:
-        if self.N == 0:
-            return []
-
-        if self.cui2surfaces:
-            term_w = self._expand_query_from_dict(query)
+    def _term_contribs(
+        self, term: str, k1: float, b: float, cache: Dict[str, Optional[list]]
+    ) -> list:
+        """[(doc_id, BM25 contribution)] for ``term``; memoized for keys present in ``cache``."""
+        hit = cache.get(term)
+        if hit is not None:
+            return hit
+        posting = self.inverted.get(term)
+        if not posting:
+            hit = []
         else:
-            term_w = {t: 1.0 for t in _tok(query)}
-
-        scores: Dict[str, float] = {}
-        for qt, w in term_w.items():
-            posting = self.inverted.get(qt)
-            if not posting:
-                continue
-            idf = self._idf(qt)
+            idf = self._idf(term)
+            hit = []
             for doc_id, tf in posting.items():
                 dl = self.doc_len.get(doc_id, 0)
                 contrib = idf * (
                     (tf * (k1 + 1.0))
                     / (tf + k1 * (1.0 - b + b * (dl / (self.avgdl + 1e-9))) + 1e-9)
                 )
+                hit.append((doc_id, contrib))
+        if term in cache:
+            cache[term] = hit
+        return hit
+
+    def _bm25(
+        self, term_w: Dict[str, float], k1: float, b: float, cache: Dict[str, Optional[list]]
+    ) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        for qt, w in term_w.items():
+            for doc_id, contrib in self._term_contribs(qt, k1, b, cache):
                 scores[doc_id] = scores.get(doc_id, 0.0) + (w * contrib)
+        return scores
+
+    def _query_terms(self, query: str) -> Dict[str, float]:
+        if self.cui2surfaces:
+            return self._expand_query_from_dict(query)
+        return {t: 1.0 for t in _tok(query)}
+
+    def retrieve(
+        self, query: str, topk: int = 50, k1: float = 1.5, b: float = 0.75
+    ) -> List[Tuple[str, float]]:
+        if self.N == 0:
+            return []
+        return self._rank(query, self._query_terms(query), topk, k1, b, {})
+
+    def retrieve_batch(
+        self, queries: List[str], topk: int = 50, k1: float = 1.5, b: float = 0.75
+    ) -> List[List[Tuple[str, float]]]:
+        """``retrieve`` for many queries; results are identical, in input order.
+
+        Posting lists of terms shared by several queries are scored once and
+        reused, so templated or overlapping queries do not rescore them.
+        """
+        if self.N == 0:
+            return [[] for _ in queries]
+        term_ws = [self._query_terms(q) for q in queries]
+        seen: set = set()
+        cache: Dict[str, Optional[list]] = {}
+        for term_w in term_ws:
+            for t in term_w:
+                if t in seen:
+                    cache[t] = None  # shared: memoize on first use
+                else:
+                    seen.add(t)
+        return [
+            self._rank(q, term_w, topk, k1, b, cache)
+            for q, term_w in zip(queries, term_ws)
+        ]
+
+    def _rank(
+        self,
+        query: str,
+        term_w: Dict[str, float],
+        topk: int,
+        k1: float,
+        b: float,
+        cache: Dict[str, Optional[list]],
+    ) -> List[Tuple[str, float]]:
+        scores = self._bm25(term_w, k1, b, cache)
 
         # Phrase boost (exact substring of multiword phrases)
         if self.phrase_boost > 0.0:
@@ -356,19 +411,7 @@ class TextRetriever:
             for t, w in prf.items():
                 combined[t] = combined.get(t, 0.0) + (1.0 - self.rm3_orig_weight) * w
 
-            scores2: Dict[str, float] = {}
-            for qt, w in combined.items():
-                posting = self.inverted.get(qt)
-                if not posting:
-                    continue
-                idf = self._idf(qt)
-                for doc_id, tf in posting.items():
-                    dl = self.doc_len.get(doc_id, 0)
-                    contrib = idf * (
-                        (tf * (k1 + 1.0))
-                        / (tf + k1 * (1.0 - b + b * (dl / (self.avgdl + 1e-9))) + 1e-9)
-                    )
-                    scores2[doc_id] = scores2.get(doc_id, 0.0) + (w * contrib)
+            scores2 = self._bm25(combined, k1, b, cache)
             ranked = sorted(scores2.items(), key=lambda kv: kv[1], reverse=True)
 
         return ranked[: max(0, int(topk))]
@@ -13,6 +13,7 @@ from __future__ import annotations
 import csv
 import io
 import os
+import sys
 from typing import Dict, List, Optional, Set, Tuple
 
 
@@ -52,9 +53,12 @@ class KGLoader:
 
         # Core storage
         self.edge_set: Set[Tuple[str, str, str]] = set()
-        self.hp_to_tails: Dict[Tuple[str, str], Set[str]] = {}
+        # (head, predicate) -> sorted tails, frozen once loading finishes
+        self.hp_to_tails: Dict[Tuple[str, str], Tuple[str, ...]] = {}
         self.ht_to_preds: Dict[Tuple[str, str], Set[str]] = {}
         self.h_to_edges: Dict[str, List[Tuple[str, str]]] = {}
+        # Small, fixed predicate vocabulary (interned strings)
+        self.predicates: Set[str] = set()
 
         # Metadata
         self.nodes: Set[str] = set()
@@ -68,6 +72,7 @@ class KGLoader:
     # -----------------------------
 
     def _load(self):
+        hp_to_tails: Dict[Tuple[str, str], Set[str]] = {}
         with io.open(self.kg_csv_path, "r", encoding="utf-8-sig", newline="") as f:
             reader = csv.DictReader(f)
             if not reader.fieldnames:
@@ -92,9 +97,15 @@ class KGLoader:
                 if not (h and r and t):
                     continue
 
+                # One shared string per node/predicate instead of one per row
+                h = sys.intern(h)
+                r = sys.intern(r)
+                t = sys.intern(t)
+                self.predicates.add(r)
+
                 self.edge_set.add((h, r, t))
 
-                self.hp_to_tails.setdefault((h, r), set()).add(t)
+                hp_to_tails.setdefault((h, r), set()).add(t)
                 self.ht_to_preds.setdefault((h, t), set()).add(r)
                 self.h_to_edges.setdefault(h, []).append((r, t))
 
@@ -102,6 +113,9 @@ class KGLoader:
                 self.nodes.add(t)
                 self.edges += 1
 
+        # Sorted once here, so tails() is a lookup rather than a sort per call.
+        self.hp_to_tails = {k: tuple(sorted(v)) for k, v in hp_to_tails.items()}
+
         print(
             f"[INFO] KG loaded: nodes={len(self.nodes)}, edges={self.edges}, "
             f"file={self.kg_version}"
@@ -119,7 +133,7 @@ class KGLoader:
         ) in self.edge_set
 
     def tails(self, head: str, predicate: str) -> List[str]:
-        return sorted(self.hp_to_tails.get((_norm_cui(head), _norm_rel(predicate)), []))
+        return list(self.hp_to_tails.get((_norm_cui(head), _norm_rel(predicate)), ()))
 
     def predicates_between(self, head: str, tail: str) -> List[str]:
         return sorted(self.ht_to_preds.get((_norm_cui(head), _norm_cui(tail)), []))